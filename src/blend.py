@@ -1,6 +1,6 @@
 import skia
 from draw import DrawRRect
-from compositing import VisualEffect, parse_transform, Transform
+from compositing import VisualEffect, Transform
 import config
 
 
@@ -40,6 +40,17 @@ class Blend(VisualEffect):
             canvas.restore()
 
 
+    def same_as(self, effect):
+        """
+        whether an effect blends its children the same way
+        """
+
+        return isinstance(effect, Blend) and effect.node is self.node \
+            and effect.opacity == self.opacity \
+            and effect.blend_mode == self.blend_mode \
+            and effect.clip_rect() == self.clip_rect()
+
+
     def clone(self, child):
         """
         make a copy of the Blend node
@@ -54,17 +65,29 @@ class Blend(VisualEffect):
         returns the intersected between rect and last child node
         """
 
-        if self.children and isinstance(self.children[-1], Blend) and \
-           self.children[-1].blend_mode == "destination-in":
-    
+        clip_rect = self.clip_rect()
+
+        if clip_rect is not None:
             bounds = rect.makeOffset(0.0, 0.0)
 
             # calculate overlapping area
-            bounds.intersect(self.children[-1].rect)
+            bounds.intersect(clip_rect)
             return bounds
 
         else:
             return rect
+
+
+    def clip_rect(self):
+        """
+        rect the children are clipped to, None if they are not clipped
+        """
+
+        if self.children and isinstance(self.children[-1], Blend) and \
+           self.children[-1].blend_mode == "destination-in":
+            return self.children[-1].rect
+
+        return None
         
 
     def unmap(self, rect):
@@ -114,16 +137,19 @@ def parse_blend_mode(blend_mode_str):
 
 def paint_visual_effects(node, cmds, rect):
     """
-    helps create blend node
+    helps create blend node. effects which would not change 
+    anything are left out, so most nodes add no effect nodes at all
     """
 
-    translation = parse_transform(node.style.get("transform", ""))
-    opacity = float(node.style.get("opacity", "1.0"))
-    blend_mode = node.style.get("mix-blend-mode")
+    computed = node.computed_style
+
+    translation = computed.translation
+    opacity = computed.opacity
+    blend_mode = computed.blend_mode
 
-    if node.style.get("overflow", "visible") == "clip":
+    if computed.clips:
 
-        border_radius = float(node.style.get("border-radius", "0px")[:-2])
+        border_radius = computed.border_radius
 
         if not blend_mode:
             blend_mode = "source-over"
@@ -132,6 +158,28 @@ def paint_visual_effects(node, cmds, rect):
                           [DrawRRect(rect, border_radius, "white")]))
 
 
-    blend_op = Blend(opacity, blend_mode, node, cmds)
-    node.blend_op = blend_op
-    return [Transform(translation, rect, node, [blend_op])]
+    if opacity < 1 or blend_mode:
+        node.blend_op = Blend(opacity, blend_mode, node, cmds)
+        cmds = [node.blend_op]
+
+    else:
+        node.blend_op = None
+
+    if translation:
+        cmds = [Transform(translation, rect, node, cmds)]
+
+    return cmds
+
+
+def get_blend_op(node):
+    """
+    returns the blend effect of a node. nodes without any effect 
+    painted get a no-op one, so that an animation which ends on 
+    opacity 1 still replaces the blend the browser has composited
+    """
+
+    if node.blend_op:
+        return node.blend_op
+
+    computed = node.computed_style
+    return Blend(computed.opacity, computed.blend_mode, node, [])
@@ -1,8 +1,8 @@
+import re
+
 from text import Text
-from element import Element
 from draw import DrawRRect
-from helpers import get_font
-from text_layout import TextLayout
+from helpers import get_font, font_metrics, measure_words, shift_tree, clear_needs_layout, tree_to_list
 from line_layout import LineLayout
 from input_layout import InputLayout
 from blend import paint_visual_effects
@@ -16,15 +16,8 @@ HEIGHT = 600
 INPUT_WIDTH_PX = 200
 FONTS = {}
 
-
-BLOCK_ELEMENTS = [
-    "html", "body", "article", "section", "nav", "aside",
-    "h1", "h2", "h3", "h4", "h5", "h6", "hgroup", "header",
-    "footer", "address", "p", "hr", "pre", "blockquote",
-    "ol", "ul", "menu", "li", "dl", "dt", "dd", "figure",
-    "figcaption", "main", "div", "table", "form", "fieldset",
-    "legend", "details", "summary"
-]
+# words are separated by whitespace, same as str.split
+WORD = re.compile(r"\S+")
 
 
 class BlockLayout:
@@ -33,7 +26,15 @@ class BlockLayout:
         self.parent = parent
         self.previous = previous
         self.children = []
-        self.display_list = []
+
+        # cached paint commands of the subtree, see paint_tree
+        self.display_list = None
+
+        # used to find the layout object when the node needs a repaint
+        node.layout_object = self
+
+        # new layout objects have never been laid out
+        self.needs_layout = True
 
         # position info
         self.x = 0
@@ -47,10 +48,20 @@ class BlockLayout:
         recursively split nodes based on html node type
         """
 
+        # every node inline content is built from is laid out now
+        clear_needs_layout(node)
+
         if isinstance(node, Text):
-                
-            for word in node.text.split():
-                self.word(node, word)
+
+            # words of a text node are measured together
+            computed = node.computed_style
+            font = get_font(computed.font_size, computed.font_weight, computed.font_style)
+
+            spans = [match.span() for match in WORD.finditer(node.text)]
+            words = [node.text[start:end] for start, end in spans]
+
+            for (start, end), w in zip(spans, measure_words(font, words)):
+                self.word(node, start, end, font, w)
 
         else:
 
@@ -70,49 +81,41 @@ class BlockLayout:
         compute styling, sizing info for input html elements
         """
 
+        # the text of a button is painted by the button itself, so 
+        # nothing below it is laid out on its own. dirty bits left set 
+        # would stop mark_needs_layout from flagging the ancestors
+        for descendant in tree_to_list(node, [])[1:]:
+            clear_needs_layout(descendant)
+
         w = INPUT_WIDTH_PX
 
         if self.cursor_x + w > self.width:
             self.new_line()
 
         line = self.children[-1]
-        prev_word = line.children[-1] if line.children else None
+        line.add_input(InputLayout(node, line))
 
-        input = InputLayout(node, line, prev_word)
-        line.children.append(input)
+        computed = node.computed_style
+        font = get_font(computed.font_size, computed.font_weight, computed.font_style)
 
-        weight = node.style["font-weight"]
-        style = node.style["font-style"]
+        self.cursor_x += w + font_metrics(font).space_width
 
-        size = int(float(node.style["font-size"][:-2]) * 0.75)
-        font = get_font(size, weight, style)
 
-        self.cursor_x += w + font.measureText(" ")
-
-
-    def word(self, node, word):
+    def word(self, node, start, end, font, w):
         """
         estimates when to break onto next line
-        by making use of font & screen width
+        by making use of font & screen width.
+        the word is node.text[start:end]
         """
 
-        weight = node.style["font-weight"]
-        style = node.style["font-style"]
-        size = int(float(node.style["font-size"][:-2]) * .75)
-        font = get_font(size, weight, style)
-
-        w = font.measureText(word)
-
         # if cursor goes beyond a limit break 
         # content into a new line
         if self.cursor_x + w > self.width:
             self.new_line()
         
         line = self.children[-1]
-        prev_word = line.children[-1] if line.children else None
-        text = TextLayout(node, word, line, prev_word)
-        line.children.append(text)
-        self.cursor_x += w + font.measureText(" ")
+        line.add_word(node, font, start, end, w)
+        self.cursor_x += w + font_metrics(font).space_width
 
 
     def new_line(self):
@@ -150,8 +153,8 @@ class BlockLayout:
         if isinstance(self.node, Text):
             return "inline"
         
-        elif any([isinstance(child, Element) and \
-                  child.tag in BLOCK_ELEMENTS for child in self.node.children]):
+        # tracked by the node as children are added
+        elif self.node.has_block_child:
             return "block"
         
         elif self.node.children or self.node.tag == "input":
@@ -163,43 +166,102 @@ class BlockLayout:
 
     def layout(self):
         """
-        recursively building block layout nodes based on html nodes
+        recursively building block layout nodes based on html nodes.
+        layout objects are kept between renders, subtrees without 
+        dirty nodes are only moved when a block above them changed height
         """
 
-        # compute width
-        self.x = self.parent.x
-        self.width = self.parent.width
-
         # compute x, y if sibling
         if self.previous:
-            self.y = self.previous.y + self.previous.height
+            y = self.previous.y + self.previous.height
 
         # if no sibling
         else:
-            self.y = self.parent.y
+            y = self.parent.y
+
+        # nothing changed inside this block, keep its layout
+        if not self.needs_layout and not self.node.needs_layout \
+            and not self.node.children_need_layout \
+            and self.x == self.parent.x and self.width == self.parent.width:
+
+            if y != self.y: shift_tree(self, y - self.y)
+            return
+
+        # children have to move along if this block moved
+        moved = (self.x, self.y, self.width) != (self.parent.x, y, self.parent.width)
+
+        # compute width
+        self.x = self.parent.x
+        self.width = self.parent.width
+        self.y = y
+        self.display_list = None
     
         mode = self.layout_mode()
 
         if mode == "block":
-            prev = None
 
-            for child in self.node.children:
-                next = BlockLayout(child, self, prev)
-                self.children.append(next)
-                prev = next
+            # children can only have changed if the node itself is dirty,
+            # if only nodes further down are dirty the children are kept
+            if self.needs_layout or self.node.needs_layout:
+                self.update_children()
+
+            clear_needs_layout(self.node)
+            self.layout_children(moved)
 
         else:
+            self.children = []
             self.new_line()
             self.recurse(self.node)
 
-        # lay down nodes
-        for child in self.children:
-            child.layout()
+            # lay down nodes
+            for child in self.children:
+                child.layout()
 
         # calculate height
         self.height = sum([child.height for child in self.children])
+        self.needs_layout = False
     
 
+    def layout_children(self, moved):
+        """
+        lays out child blocks which are dirty or have to move since
+        a block above them changed height, the others stay as they are
+        """
+
+        for child in self.children:
+            if not moved and not child.needs_layout and not child.node.needs_layout \
+                and not child.node.children_need_layout:
+                continue
+
+            bottom = child.y + child.height
+            child.layout()
+
+            # blocks below only move if the bottom edge of this one did
+            moved = child.y + child.height != bottom
+
+
+    def update_children(self):
+        """
+        creates block layout objects for the children of a node, 
+        reusing the ones of children which are still in the tree
+        """
+
+        old_children = {id(child.node): child for child in self.children 
+                        if isinstance(child, BlockLayout)}
+        self.children = []
+        prev = None
+
+        for child in self.node.children:
+            next = old_children.get(id(child))
+
+            if next is None or next.node is not child:
+                next = BlockLayout(child, self, prev)
+
+            next.previous = prev
+            self.children.append(next)
+            prev = next
+
+
     def self_rect(self):
         return skia.Rect.MakeLTRB(self.x, self.y, self.x + self.width, self.y + self.height)
 
@@ -211,11 +273,11 @@ class BlockLayout:
 
         cmds = []
 
-        bg_color = self.node.style.get("background-color", "transparent")
+        computed = self.node.computed_style
 
-        if bg_color != "transparent":
-            radius = float(self.node.style.get("border-radius", "0px")[:-2])
-            cmds.append(DrawRRect(self.self_rect(), radius, bg_color))
+        if computed.background_color is not None:
+            cmds.append(DrawRRect(self.self_rect(), computed.border_radius, 
+                                  computed.background_color))
 
         return cmds
     
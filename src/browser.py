@@ -3,25 +3,32 @@ import sys
 import threading
 import urllib
 import math
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 
 import sdl2
 import skia
 import OpenGL.GL
 
-from helpers import get_font, linespace, paint_tree, tree_to_list, add_parent_pointers
+from helpers import get_font, linespace, paint_tree, tree_to_list, add_parent_pointers, mark_needs_layout, mark_needs_paint
 from draw import DrawText, DrawLine
-from client import URL
+from client import URL, HTTP_CACHE
 from task import Task, TaskRunner
 from document_layout import DocumentLayout
+from line_layout import LineLayout
 from html_parser import HTMLParser
-from css_parser import CSSParser, style, cascade_priority
+from preload_scanner import PreloadScanner
+from css_parser import CSSParser, style, mark_needs_style
+from stylesheet import Stylesheet
+from computed_style import ComputedStyle
 from element import Element
 from text import Text
 from js_context import JSContext
 from profiler import MeasureTime
 from commit import CommitData
-from compositing import CompositedLayer, PaintCommand, DrawCompositedLayer, absolute_bounds_for_obj, DrawOutline, local_to_absolute
-from blend import Blend
+from compositing import TILE_CACHE, CompositedLayer, PaintCommand, DrawCompositedLayer, absolute_bounds_for_obj, absolute_bounds, DrawOutline, local_to_absolute
+from blend import Blend, get_blend_op
+from spatial_index import SpatialIndex
 
 
 WIDTH = 800
@@ -30,7 +37,12 @@ HSTEP = 13
 VSTEP = 18
 SCROLL_STEP = 50
 REFRESH_RATE_SEC = 0.033
-DEFAULT_STYLE_SHEET = CSSParser(open("./browser.css").read()).parse()
+DEFAULT_STYLE_SHEET = Stylesheet(CSSParser(open("./browser.css").read()).parse())
+MAX_PARALLEL_FETCHES = 6
+
+# worker threads shared by all tabs to download scripts and stylesheets
+SUBRESOURCE_FETCHER = ThreadPoolExecutor(max_workers=MAX_PARALLEL_FETCHES,
+                                         thread_name_prefix="Fetch Thread")
 
 
 class Browser:
@@ -87,8 +99,12 @@ class Browser:
         
         assert self.chrome_surface is not None
 
-        # will eventual store surface for the actual website content
+        # the tab contents of the last frame, only the damaged parts
+        # of it are drawn again. window buffers cannot be used for this,
+        # their contents are undefined after swapping them. scrolling
+        # copies the tab surface to the scroll surface & swaps the two
         self.tab_surface = None
+        self.scroll_surface = None
 
         self.tabs: list[Tab] = []
         self.active_tab: Tab | None = None
@@ -122,11 +138,18 @@ class Browser:
         self.active_tab_display_list = None
         self.composited_layers = []
         self.draw_list: list[DrawCompositedLayer] = []
+        self.draw_index = SpatialIndex([])
         self.composited_updates = {}
         self.needs_composite: bool = False
         self.needs_raster: bool = False
         self.needs_draw: bool = False
 
+        # parts of the page, in page coordinates, to be drawn again and
+        # the scroll the tab surface was drawn at
+        self.damage = skia.Rect.MakeEmpty()
+        self.full_damage: bool = True
+        self.drawn_scroll = None
+
 
     def commit(self, tab, data):
         """
@@ -150,18 +173,44 @@ class Browser:
                 self.active_tab_display_list = data.display_list
 
             self.animation_timer = None
-            self.composited_updates = data.composited_updates
 
-            if self.composited_updates == None:
+            if data.composited_updates == None:
                 self.composited_updates = {}
                 self.set_needs_composite()
 
+            # updates are kept until the next composite, so effects 
+            # which stopped changing still draw their latest state
             else:
+                self.composited_updates.update(data.composited_updates)
+                self.damage_effects(data.composited_updates)
                 self.set_needs_draw()
 
         self.lock.release()
 
 
+    def damage_effects(self, nodes):
+        """
+        damage the layers drawn with effects of the nodes
+        """
+
+        for layer in self.composited_layers:
+            if any([effect.node in nodes for effect in layer.effects]):
+                self.add_damage(layer.absolute_composited_bounds())
+
+
+    def add_damage(self, rect=None):
+        """
+        mark a part of the page to be drawn again,
+        without a rect the whole viewport is drawn again
+        """
+
+        if rect is None:
+            self.full_damage = True
+
+        else:
+            self.damage.join(rect)
+
+
     def clamp_scroll(self, scroll):
         """
         helps limit amount of scrolling up & down
@@ -202,7 +251,7 @@ class Browser:
             return
 
         self.active_tab_scroll = self.clamp_scroll(self.active_tab_scroll - SCROLL_STEP)
-        self.set_needs_raster_and_draw()
+        self.set_needs_draw()
         self.needs_animation_frame = True
         self.lock.release()
 
@@ -290,9 +339,21 @@ class Browser:
         compute which skia draw objects must be 
         drawn to the tab surface
         """
+
+        viewport = self.viewport_rect()
         
         for composited_layer in self.composited_layers:
-            composited_layer.raster()
+            composited_layer.raster(viewport)
+
+
+    def viewport_rect(self):
+        """
+        part of the page visible in the window
+        """
+
+        return skia.Rect.MakeLTRB(
+            0, self.active_tab_scroll, WIDTH, 
+            self.active_tab_scroll + HEIGHT - self.chrome.bottom)
 
 
     def schedule_animation_frame(self):
@@ -380,8 +441,13 @@ class Browser:
         
         if not isinstance(effect, Blend):
             return effect
-        
-        return self.composited_updates[node]
+
+        # updated blends come from a newer paint that was never
+        # composited, they take the place of the old one in its tree
+        latest = self.composited_updates[node]
+        latest.parent = effect.parent
+
+        return latest
 
 
     def set_needs_raster(self):
@@ -431,11 +497,17 @@ class Browser:
             self.composite()
             self.measure.stop('composite')
 
-        if self.needs_raster:
+        # layers are rastered only near the viewport,
+        # so scrolling can need more of them rastered
+        if self.needs_raster or self.needs_draw:
             self.measure.time('raster')
-            self.raster_chrome()
+
+            if self.needs_raster:
+                self.raster_chrome()
+
             self.raster_tab()
             self.measure.stop('raster')
+            self.measure.counter('tile_cache', TILE_CACHE.stats())
 
         if self.needs_draw:
             self.measure.time('draw')
@@ -455,18 +527,10 @@ class Browser:
         draw pixels on the SDL surface
         """
 
-        canvas = self.root_surface.getCanvas()
-        canvas.clear(skia.ColorWHITE)
-
-        canvas.save()
-
-        canvas.translate(0, self.chrome.bottom - self.active_tab_scroll)
-
-        # draw items to the root surface
-        for item in self.draw_list:
-            item.execute(canvas)
+        self.draw_tab()
 
-        canvas.restore()
+        canvas = self.root_surface.getCanvas()
+        self.tab_surface.draw(canvas, 0, 0)
 
         chrome_rect = skia.Rect.MakeLTRB(0, 0, WIDTH, self.chrome.bottom)
         canvas.save()
@@ -485,6 +549,108 @@ class Browser:
         sdl2.SDL_GL_SwapWindow(self.sdl_window)
 
 
+    def draw_tab(self):
+        """
+        draw the damaged parts of the viewport onto the tab surface,
+        the rest of it still shows the last frame
+        """
+
+        # tab surfaces have the size of the window, 
+        # so tab contents are drawn at the same offsets
+        if not self.tab_surface:
+            self.tab_surface = self.make_window_surface()
+            self.scroll_surface = self.make_window_surface()
+            self.full_damage = True
+
+        scroll = self.active_tab_scroll
+
+        if self.drawn_scroll is None:
+            self.full_damage = True
+
+        elif scroll != self.drawn_scroll and not self.full_damage:
+            self.scroll_tab(scroll - self.drawn_scroll)
+
+        viewport = self.viewport_rect()
+        canvas = self.tab_surface.getCanvas()
+        canvas.save()
+        canvas.translate(0, self.chrome.bottom - scroll)
+
+        if self.full_damage:
+            canvas.clear(skia.ColorWHITE)
+            damage = viewport
+
+        else:
+            damage = self.damage.makeOffset(0, 0)
+
+            # damaged parts are cleared and everything overlapping them drawn again
+            if damage.intersect(viewport):
+                canvas.clipRect(damage)
+                canvas.clear(skia.ColorWHITE)
+
+            else:
+                damage = skia.Rect.MakeEmpty()
+
+        if not damage.isEmpty():
+            for i in self.draw_index.query(damage):
+                self.draw_list[i].execute(canvas)
+
+        canvas.restore()
+
+        self.damage = skia.Rect.MakeEmpty()
+        self.full_damage = False
+        self.drawn_scroll = scroll
+
+
+    def scroll_tab(self, dy):
+        """
+        move what is drawn on the tab surface by a scroll of dy,
+        only the strip scrolled into view is damaged
+        """
+
+        viewport = self.viewport_rect()
+
+        # moving by a fraction of a pixel would blur 
+        # & after a whole screen there is nothing to keep
+        if dy != int(dy) or abs(dy) >= viewport.height():
+            self.add_damage()
+            return
+
+        image = self.tab_surface.makeImageSnapshot()
+        self.tab_surface, self.scroll_surface = self.scroll_surface, self.tab_surface
+
+        # copying to another surface avoids copying the snapshot first
+        paint = skia.Paint(BlendMode=skia.BlendMode.kSrc)
+        self.tab_surface.getCanvas().drawImage(
+            image, 0, -dy, skia.SamplingOptions(), paint)
+
+        if dy > 0:
+            strip = skia.Rect.MakeLTRB(0, viewport.bottom() - dy, 
+                                       WIDTH, viewport.bottom())
+
+        else:
+            strip = skia.Rect.MakeLTRB(0, viewport.top(), 
+                                       WIDTH, viewport.top() - dy)
+
+        # pixel rows at the edge of the strip are partly in it
+        self.add_damage(strip.makeOutset(0, 1))
+
+
+    def make_window_surface(self):
+        """
+        surface the size of the window, on the GPU if possible
+        """
+
+        surface = skia.Surface.MakeRenderTarget(
+            self.skia_context, skia.Budgeted.kNo,
+            skia.ImageInfo.MakeN32Premul(WIDTH, HEIGHT))
+        
+        if not surface:
+            surface = skia.Surface(WIDTH, HEIGHT)
+
+        assert surface
+        return surface
+
+
     def paint_draw_list(self):
         """
         using list of composited layers to 
@@ -494,6 +660,11 @@ class Browser:
         new_effects = {}
         self.draw_list = []
 
+        # for each effect the draw list item it ends up in, and the 
+        # bounds of the layers under each draw list item
+        draw_item_of = {}
+        bounds = []
+
         # iterate over all the composited layers
         for composited_layer in self.composited_layers:
             current_effect = DrawCompositedLayer(composited_layer)
@@ -502,6 +673,7 @@ class Browser:
             if not composited_layer.display_items: continue
 
             parent = composited_layer.display_items[0].parent
+            created = []
 
             while parent:
                 
@@ -510,15 +682,26 @@ class Browser:
 
                 if new_parent in new_effects:
                     new_effects[new_parent].children.append(current_effect)
+                    i = draw_item_of[new_parent]
                     break
                 
                 else:
                     current_effect = new_parent.clone(current_effect)
                     new_effects[new_parent] = current_effect
+                    created.append(new_parent)
                     parent = new_parent.parent
 
             if not parent:
+                i = len(self.draw_list)
                 self.draw_list.append(current_effect)
+                bounds.append(skia.Rect.MakeEmpty())
+
+            for effect in created:
+                draw_item_of[effect] = i
+
+            bounds[i].join(composited_layer.absolute_composited_bounds())
+
+        self.draw_index = SpatialIndex(bounds)
 
 
     def clear_data(self):
@@ -529,7 +712,14 @@ class Browser:
         self.active_tab_scroll = 0
         self.active_tab_url = None
         self.display_list = []
+
+        for layer in self.composited_layers:
+            layer.release()
+
+        self.add_damage()
         self.composited_layers = []
+        self.draw_list = []
+        self.draw_index = SpatialIndex([])
         self.composited_updates = {}
 
 
@@ -545,6 +735,7 @@ class Browser:
         # I think this is used to determine if 
         # composited layers have a common ancestor
         add_parent_pointers(self.active_tab_display_list)
+        old_layers = self.composited_layers
         self.composited_layers: List[CompositedLayer] = []
         all_commands = []
 
@@ -583,6 +774,34 @@ class Browser:
                 layer = CompositedLayer(self.skia_context, cmd)
                 self.composited_layers.append(layer)
 
+        # new layers take over the tiles of the old layer they replace,
+        # so only tiles with changed display items are rastered again.
+        # what changed on the page is damaged, so it is drawn again
+        old_order = {id(layer): i for i, layer in enumerate(old_layers)}
+        last_adopted = -1
+
+        for layer in self.composited_layers:
+            for old_layer in old_layers:
+                if layer.replaces(old_layer):
+                    for rect in layer.adopt_tiles(old_layer):
+                        self.add_damage(rect)
+
+                    # layers drawn in a different order can look 
+                    # different wherever they overlap
+                    if old_order[id(old_layer)] < last_adopted:
+                        self.add_damage()
+
+                    last_adopted = old_order[id(old_layer)]
+                    old_layers.remove(old_layer)
+                    break
+
+            else:
+                self.add_damage(layer.absolute_composited_bounds())
+
+        for old_layer in old_layers:
+            self.add_damage(old_layer.absolute_composited_bounds())
+            old_layer.release()
+
         # recompute the active tabs height due to composited layers
         self.active_tab_height = 0
         for layer in self.composited_layers:
@@ -846,6 +1065,9 @@ class Tab:
         self.needs_layout: bool = False
         self.needs_paint: bool = False
 
+        # layout tree, kept between renders of the same page
+        self.document = None
+
         self.composited_updates = []
 
         # init task queue for tab
@@ -874,7 +1096,11 @@ class Tab:
                 # if we have a new value for the property update 
                 # the nodes property with new value
                 if value:
-                    node.style[property_name] = value
+                    # computed styles are read-only & might be 
+                    # shared, so the animated node gets its own copy
+                    node.style = MappingProxyType({**node.style, property_name: value})
+                    node.computed_style = ComputedStyle(node.style)
+                    mark_needs_paint(node)
                     self.composited_updates.append(node)
                     self.set_needs_paint()
 
@@ -893,7 +1119,7 @@ class Tab:
             composited_updates = {}
 
             for node in self.composited_updates:
-                composited_updates[node] = node.blend_op
+                composited_updates[node] = get_blend_op(node)
 
         self.composited_updates = []
         
@@ -949,9 +1175,18 @@ class Tab:
         y += self.scroll
 
         loc_rect = skia.Rect.MakeXYWH(x, y, 1, 1)
-        objs = [obj for obj in tree_to_list(self.document, [])
-                if absolute_bounds_for_obj(obj).intersects(
-                    loc_rect)]
+        objs = []
+
+        for obj in tree_to_list(self.document, []):
+            if absolute_bounds_for_obj(obj).intersects(loc_rect):
+                objs.append(obj)
+
+            # words only get layout objects of their own when they might be hit
+            if isinstance(obj, LineLayout) and \
+                absolute_bounds(obj.text_rect(), obj.node).intersects(loc_rect):
+
+                objs.extend([word for word in obj.text_layouts() 
+                             if absolute_bounds_for_obj(word).intersects(loc_rect)])
         
         if not objs: return
         elt = objs[-1].node
@@ -977,7 +1212,7 @@ class Tab:
 
                 self.focus = elt
                 elt.is_focused = True
-                self.set_needs_render()
+                self.set_needs_style(elt)
                 return
 
             elif elt.tag == "button":
@@ -1047,11 +1282,23 @@ class Tab:
         self.browser.set_needs_animation_frame(self)
 
 
-    def set_needs_layout(self):
+    def set_needs_style(self, node):
+        """
+        restyle a node on the next render, 
+        instead of restyling the whole tree
+        """
+
+        mark_needs_style(node)
+        self.set_needs_render()
+
+
+    def set_needs_layout(self, node):
         """
-        setting flags when browser needs to update layout
+        lay out a node again on the next render, 
+        used when its children have been replaced
         """
 
+        mark_needs_layout(node)
         self.needs_layout = True
         self.browser.set_needs_animation_frame(self)
 
@@ -1075,9 +1322,10 @@ class Tab:
         self.scroll_changed_in_tab = True
         self.task_runner.clear_pending_tasks()
 
-        # download html file from the server
+        # download headers of the html file from the server,
+        # the body is parsed below as it keeps arriving
         self.browser.measure.time('fetch_page')
-        headers, body = url.request(self.url, payload)
+        headers, body = url.stream(self.url, payload)
         self.browser.measure.stop('fetch_page')
 
         # set tab url and add url to tab history
@@ -1093,8 +1341,23 @@ class Tab:
             if len(csp) > 0 and csp[0] == "default-src":
                 self.allowed_origins = csp[1:]
 
-        # parse html file and create tree of nodes
-        self.nodes = HTMLParser(body).parse()
+        # parse html file chunk by chunk while it is 
+        # downloading and create tree of nodes
+        self.browser.measure.time('parse_html')
+        parser = HTMLParser()
+
+        # scans each chunk ahead of the parser and starts 
+        # downloading scripts and stylesheets right away
+        scanner = PreloadScanner(url, self.allowed_request,
+            lambda subresource_url: SUBRESOURCE_FETCHER.submit(subresource_url.request, url))
+
+        with body:
+            for chunk in body:
+                scanner.feed(chunk)
+                parser.feed(chunk)
+
+        self.nodes = parser.finish()
+        self.browser.measure.stop('parse_html')
 
         if self.js: self.js.discarded = True
 
@@ -1109,7 +1372,19 @@ class Tab:
                    and node.tag == "script"
                    and "src" in node.attributes]
         
-        # download js scripts used by the document
+        # get links of all stylesheets used by the webpage
+        links = [node.attributes["href"]
+                 for node in tree_to_list(self.nodes, [])
+                 if isinstance(node, Element)
+                 and node.tag == "link"
+                 and node.attributes.get("rel") == "stylesheet"
+                 and "href" in node.attributes]
+
+        # download js scripts and stylesheets used by the document 
+        # concurrently, so that load takes as long as the slowest download 
+        # instead of the sum of all of them. most downloads were already 
+        # started by the preload scanner while the page was parsed
+        script_requests = []
         for script in scripts:
             script_url = self.url.resolve(script)
 
@@ -1117,9 +1392,22 @@ class Tab:
                 print("Blocked script", script, "due to CSP !")
                 continue
 
+            script_requests.append((script_url, scanner.fetch(script_url)))
+
+        style_requests = []
+        for link in links:
+            style_url = self.url.resolve(link)
+            style_requests.append(scanner.fetch(style_url))
+
+        self.browser.measure.time('fetch_subresources')
+
+        # scripts are run in document order even if they 
+        # finished downloading in a different order
+        for script_url, request in script_requests:
+
             try:
 
-                headers, body = script_url.request(url)
+                headers, body = request.result()
 
             except:
                 continue
@@ -1127,29 +1415,24 @@ class Tab:
             task = Task(self.js.run, script_url, body)
             self.task_runner.schedule_task(task)
 
-        # init css rules with a copy of default stylesheet
-        self.rules = DEFAULT_STYLE_SHEET.copy()
-
-        # get links of all stylesheets used by the webpage
-        links = [node.attributes["href"]
-                 for node in tree_to_list(self.nodes, [])
-                 if isinstance(node, Element)
-                 and node.tag == "link"
-                 and node.attributes.get("rel") == "stylesheet"
-                 and "href" in node.attributes]
-        
-        # iterate and download stylesheets and 
-        # append rules to existing rules
-        for link in links:
-            style_url = self.url.resolve(link)
+        # gather rules of all stylesheets in document order
+        rules = []
+        for request in style_requests:
 
             try:
-                headers, body = style_url.request(url)
+                headers, body = request.result()
 
             except:
                 continue
             
-            self.rules.extend(CSSParser(body).parse())
+            rules.extend(CSSParser(body).parse())
+
+        # rules only change when the page loads, so they are compiled 
+        # once here on top of the shared default stylesheet
+        self.stylesheet = DEFAULT_STYLE_SHEET.extend(rules)
+
+        self.browser.measure.stop('fetch_subresources')
+        self.browser.measure.counter('http_cache', HTTP_CACHE.stats())
 
         self.set_needs_render()
         self.loaded = True
@@ -1174,12 +1457,17 @@ class Tab:
         self.browser.measure.time('render')
 
         if self.needs_style:
-            style(self.nodes, sorted(self.rules, key=cascade_priority), self)
+            style(self.nodes, self.stylesheet, self)
             self.needs_layout = True
             self.needs_style = False
 
         if self.needs_layout:
-            self.document = DocumentLayout(self.nodes)
+
+            # a new page gets a new layout tree, 
+            # otherwise only dirty nodes are laid out again
+            if not self.document or self.document.node is not self.nodes:
+                self.document = DocumentLayout(self.nodes)
+
             self.document.layout()
             self.needs_paint = True
             self.needs_layout = False
@@ -1208,7 +1496,7 @@ class Tab:
         if self.focus:
             if self.js.dispatch_event("keydown", self.focus): return
             self.focus.attributes["value"] += char
-            self.set_needs_render()
+            self.set_needs_style(self.focus)
 
 
     def __repr__(self):
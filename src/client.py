@@ -1,10 +1,23 @@
-import socket
-import ssl
 import os
+import zlib
+import codecs
+
+import config
+from connection_pool import ConnectionPool
+from http_cache import HTTPCache, is_cacheable
 
 
 COOKIE_JAR = {}
 
+# sockets shared by all tabs, keyed by (scheme, host, port)
+CONNECTION_POOL = ConnectionPool()
+
+# responses shared by all tabs, keyed by url
+HTTP_CACHE = HTTPCache(config.HTTP_CACHE_MAX_BYTES, config.HTTP_CACHE_DIR)
+
+# size of reads from the socket while streaming a body
+READ_SIZE = 64 * 1024
+
 
 class URL:
 
@@ -37,36 +50,52 @@ class URL:
         make request to host and get response
         """
 
+        headers, body = self.stream(referrer, payload)
+
+        with body:
+            return headers, "".join(body)
+
+
+    def stream(self, referrer, payload=None):
+        """
+        make request to host and get response headers. the body is 
+        returned as a ResponseBody of text chunks decoded as they arrive
+        from the socket, it must be read or closed to free the connection
+        """
+
         # displaying file
         if self.scheme == "file":
             headers, file_body = self.request_file()
 
-            return headers, file_body
+            return headers, ResponseBody([file_body])
         
-        # setting up connection to host
-        s = socket.socket(
-            # to specify that socket will use IPv4
-            family=socket.AF_INET,
-            # to specify that socket can send random amount of data
-            type=socket.SOCK_STREAM,
-            # to specify protocol to be used while setting connection
-            proto=socket.IPPROTO_TCP
-        )
-
-        s.connect((self.host, self.port))
-
-        if self.scheme == "https":
-            ctx = ssl.create_default_context()
-            s = ctx.wrap_socket(s, server_hostname=self.host)
-
         # determine http method to be used for request
         method = "POST" if payload else "GET"
 
+        # GET responses might already be in the http cache, fresh ones
+        # are used as is and stale ones are revalidated with the server
+        cached = None
+        if method == "GET":
+            cached, fresh = HTTP_CACHE.lookup(str(self))
+
+            if fresh:
+                return dict(cached.headers), ResponseBody([cached.body])
+
+        # other methods can change the resource, so drop what we have
+        else:
+            HTTP_CACHE.remove(str(self))
+
         # setting up additional info for sending request to host
-        request = f"{method} {self.path} HTTP/1.0\r\n"
+        request = f"{method} {self.path} HTTP/1.1\r\n"
 
         request += f"Host: {self.host}\r\n"
 
+        # ask the server to keep the socket open for subsequent requests
+        request += "Connection: keep-alive\r\n"
+
+        # compressed bodies are decoded while they are read off the socket
+        request += "Accept-Encoding: gzip, deflate\r\n"
+
         # sending cookies for a host if they have been set
         if self.host in COOKIE_JAR:
             cookie, params = COOKIE_JAR[self.host]
@@ -82,6 +111,11 @@ class URL:
             if allow_cookie:
                 request += f"Cookie: {cookie}\r\n"
 
+        # ask the server to reply 304 if our cached copy is still valid
+        if cached:
+            for header, value in cached.validators().items():
+                request += f"{header}: {value}\r\n"
+
         if payload:
             length = len(payload.encode("utf8"))
             request += f"Content-Length: {length}\r\n"
@@ -92,13 +126,74 @@ class URL:
         # add payload to request
         if payload: request += payload
 
-        # encode using utf8 encoding to bytes before sending out request
-        s.send(request.encode("utf8"))
+        # encode using utf8 encoding to bytes before sending out request.
+        # a pooled socket might have been closed by the server while it
+        # was idle, in which case we retry on a fresh connection. the
+        # server might have acted on a request before closing, so only
+        # requests which are safe to repeat are sent again
+        while True:
+            connection = CONNECTION_POOL.acquire(self.scheme, self.host, self.port)
+
+            try:
+                connection.send(request.encode("utf8"))
+                statusline = connection.response.readline().decode("utf8")
+
+            except OSError:
+                statusline = ""
+
+            if statusline: break
+
+            CONNECTION_POOL.release(connection, reusable=False)
+
+            if not connection.reused or method != "GET":
+                raise ConnectionError(f"{self.host} closed the connection")
+
+        try:
+            status, response_headers, chunks, keep_alive = \
+                self.read_response(connection.response, statusline, method)
+
+        except Exception:
+            CONNECTION_POOL.release(connection, reusable=False)
+            raise
+
+        # cached body is still valid, only headers were sent
+        if method == "GET" and status == "304" and cached:
+            CONNECTION_POOL.release(connection, reusable=keep_alive)
+            cached = HTTP_CACHE.revalidated(str(self), cached, response_headers)
+            return dict(cached.headers), ResponseBody([cached.body])
+
+        body = self.read_body(chunks, method, status, response_headers)
+
+        return response_headers, ResponseBody(body, connection, keep_alive)
+
+
+    def read_body(self, chunks, method, status, headers):
+        """
+        yields body chunks and stores the body in 
+        the http cache once all of it has been read
+        """
+
+        cacheable = method == "GET" and is_cacheable(status, headers)
+        content = []
+
+        for chunk in chunks:
+            if cacheable: content.append(chunk)
+            yield chunk
+
+        if cacheable:
+            HTTP_CACHE.store(str(self), status, headers, "".join(content))
+
+        elif method == "GET":
+            HTTP_CACHE.remove(str(self))
 
-        # we wrap socket into a file-like object so we can use read data from it
-        response = s.makefile("r", encoding="utf8", newline="\r\n")
 
-        statusline = response.readline()
+    def read_response(self, response, statusline, method):
+        """
+        read headers of a response from the socket file. the body is returned 
+        as a generator of decoded text chunks which reads the socket lazily.
+        also returns status and whether the connection can be kept alive
+        """
+
         version, status, explanation = statusline.split(" ", 2)
 
         # gathering headers
@@ -107,8 +202,8 @@ class URL:
         # read response from server line by line
         while True:
 
-            line = response.readline()
-            if line == "\r\n": break
+            line = response.readline().decode("utf8")
+            if line in ["\r\n", "\n", ""]: break
             header, value = line.split(":", 1)
             response_headers[header.casefold()] = value.strip()
 
@@ -131,15 +226,42 @@ class URL:
             COOKIE_JAR[self.host] = (cookie, params)
 
         # strategy used while trasmitting data
-        assert "transfer-encoding" not in response_headers
+        transfer_encoding = response_headers.get("transfer-encoding", "identity").casefold()
+        assert transfer_encoding in ["identity", "chunked"]
 
         # strategy used while compressing data
-        assert "content-encoding" not in response_headers
+        content_encoding = response_headers.get("content-encoding", "identity").casefold()
+        assert content_encoding in ["identity", "gzip", "x-gzip", "deflate"]
+
+        # HTTP/1.1 connections stay open unless the server says otherwise,
+        # HTTP/1.0 connections only if the server explicitly asks for it
+        connection_header = response_headers.get("connection", "").casefold()
+
+        if version == "HTTP/1.1":
+            keep_alive = connection_header != "close"
+
+        else:
+            keep_alive = connection_header == "keep-alive"
 
-        content = response.read()
-        s.close()
+        # these responses never carry a body
+        if method == "HEAD" or status.startswith("1") or status in ["204", "304"]:
+            chunks = []
 
-        return response_headers, content
+        # body is sent as a series of length prefixed chunks
+        elif transfer_encoding == "chunked":
+            chunks = read_chunked(response)
+
+        # with a known length we read exactly the body
+        # and leave the socket ready for the next response
+        elif "content-length" in response_headers:
+            chunks = read_length(response, int(response_headers["content-length"]))
+
+        # otherwise the body ends when the server closes the socket
+        else:
+            chunks = read_until_close(response)
+            keep_alive = False
+
+        return status, response_headers, decode_body(chunks, content_encoding), keep_alive
     
 
     def resolve(self, url):
@@ -213,3 +335,154 @@ class URL:
 
         return headers, body
 
+
+class ResponseBody:
+    """
+    Text chunks of a response body. The connection it is read from goes
+    back to the pool once all chunks were read, or is closed when the body
+    is closed before that, even if reading never started
+    """
+
+    def __init__(self, chunks, connection=None, keep_alive=False) -> None:
+        self.chunks = iter(chunks)
+        self.connection = connection
+        self.keep_alive = keep_alive
+
+
+    def __iter__(self):
+        return self
+
+
+    def __next__(self):
+        try:
+            return next(self.chunks)
+
+        except StopIteration:
+            self.release(self.keep_alive)
+            raise
+
+        except BaseException:
+            self.release(False)
+            raise
+
+
+    def close(self):
+        """
+        stop reading the body, the rest of it is 
+        still on the socket so it cannot be reused
+        """
+
+        if self.connection is None: return
+
+        if hasattr(self.chunks, "close"):
+            self.chunks.close()
+
+        self.release(False)
+
+
+    def release(self, reusable):
+        """
+        hand the connection back to the pool, only once
+        """
+
+        if self.connection is None: return
+
+        connection, self.connection = self.connection, None
+        CONNECTION_POOL.release(connection, reusable)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def __del__(self):
+        self.close()
+
+
+    def __repr__(self):
+        return f"ResponseBody(connection={self.connection})"
+
+
+def read_length(response, length):
+    """
+    yields a body of known length from the socket file
+    """
+
+    while length > 0:
+        data = response.read(min(length, READ_SIZE))
+        if not data: break
+        length -= len(data)
+        yield data
+
+
+def read_until_close(response):
+    """
+    yields a body which ends when the server closes the socket
+    """
+
+    while True:
+        data = response.read1(READ_SIZE)
+        if not data: break
+        yield data
+
+
+def read_chunked(response):
+    """
+    yields a body sent with chunked transfer encoding.
+    each chunk is preceded by its size in hex and followed by a line break,
+    a chunk of size 0 marks the end of the body
+    """
+
+    while True:
+        size_line = response.readline().decode("utf8")
+        if not size_line: break
+
+        # chunk extensions after ";" are ignored
+        size = int(size_line.split(";", 1)[0].strip(), 16)
+
+        if size == 0: break
+
+        yield from read_length(response, size)
+
+        # discard \r\n following the chunk data
+        response.readline()
+
+    # discard optional trailer headers up to the final empty line
+    while True:
+        line = response.readline()
+        if line in [b"\r\n", b"\n", b""]: break
+
+
+def decode_body(chunks, content_encoding):
+    """
+    incrementally decompresses and decodes body chunks to text
+    """
+
+    decompressor = None
+    text_decoder = codecs.getincrementaldecoder("utf8")()
+
+    for chunk in chunks:
+
+        if content_encoding in ["gzip", "x-gzip"] and not decompressor:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        # deflate is supposed to be zlib wrapped but some servers send raw
+        # deflate data, the zlib header is recognisable from its first two bytes
+        elif content_encoding == "deflate" and not decompressor:
+            is_zlib = len(chunk) >= 2 and chunk[0] & 0x0f == 8 \
+                and int.from_bytes(chunk[:2], "big") % 31 == 0
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS if is_zlib else -zlib.MAX_WBITS)
+
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+
+        yield text_decoder.decode(chunk)
+
+    if decompressor:
+        yield text_decoder.decode(decompressor.flush())
+
+    yield text_decoder.decode(b"", final=True)
@@ -1,6 +1,21 @@
+import math
+
 import skia
-from helpers import parse_color
-from config import SHOW_COMPOSITED_LAYER_BORDERS
+from helpers import parse_color, parse_px
+from config import SHOW_COMPOSITED_LAYER_BORDERS, TILE_CACHE_MAX_BYTES
+from spatial_index import SpatialIndex
+from tile_cache import TileCache
+
+
+# composited layers are rastered in square tiles of this size
+TILE_SIZE = 256
+
+# glyphs & strokes reach a little outside the rect of their command,
+# changed commands invalidate tiles this much around their rect
+DAMAGE_MARGIN = 4
+
+# rastered tiles of all composited layers
+TILE_CACHE = TileCache(TILE_CACHE_MAX_BYTES)
 
 
 class PaintCommand:
@@ -36,64 +51,250 @@ class CompositedLayer:
 
     def __init__(self, skia_context, display_item) -> None:
         self.skia_context = skia_context
-        self.surface = None
         self.display_items = [display_item]
         self.parent = display_item.parent
 
+        # effects the layer is drawn with, from the inside out. kept 
+        # since parent pointers change when the next display list is 
+        # composited, which may still reuse some of these effects
+        self.effects = []
+        effect = self.parent
+
+        while effect:
+            self.effects.append(effect)
+            effect = effect.parent
+
+        # bounds & index of the display items, computed on first
+        # use since items are added while compositing
+        self.bounds = None
+        self.item_rects = None
+        self.index = None
+
+        # rastered tiles by (column, row) from the top left of the layer.
+        # missing tiles are rastered once they come near the viewport
+        self.tiles = {}
+
 
     def composited_bounds(self):
         """
         compute the bounds of the composited layer
         """
 
+        if self.bounds:
+            return self.bounds
+
         rect = skia.Rect.MakeEmpty()
+        self.item_rects = [self.item_bounds(item) for item in self.display_items]
 
-        for item in self.display_items:
-            rect.join(absolute_to_local(
-                item, local_to_absolute(item, item.rect)))
+        for item_rect in self.item_rects:
+            rect.join(item_rect)
 
         rect.outset(1, 1)
 
+        self.bounds = rect
         return rect
-    
 
-    def raster(self):
+
+    def absolute_composited_bounds(self):
+        """
+        where the composited layer is drawn on the page
+        """
+
+        return self.to_absolute(self.composited_bounds())
+
+
+    def to_absolute(self, rect):
         """
-        draw display list items onto composited layer
+        map a rect in the space of the layer to the page
+        """
+
+        for effect in self.effects:
+            rect = effect.map(rect)
+
+        return rect
+
+
+    def item_bounds(self, item):
+        """
+        bounds of a display item in the space of the layer
+        """
+
+        # items at the top of the display list are in the space of the page
+        if not item.parent:
+            return item.rect
+
+        return absolute_to_local(item, local_to_absolute(item, item.rect))
+
+
+    def items_in(self, rect):
+        """
+        display items overlapping rect, in paint order
+        """
+
+        if not self.index:
+            self.composited_bounds()
+            self.index = SpatialIndex(self.item_rects)
+
+        return [self.display_items[i] for i in self.index.query(rect)]
+
+
+    def tiles_in(self, rect):
+        """
+        positions of the tiles overlapping rect
         """
 
         bounds = self.composited_bounds()
 
+        left = math.floor((rect.left() - bounds.left()) / TILE_SIZE)
+        right = math.ceil((rect.right() - bounds.left()) / TILE_SIZE)
+        top = math.floor((rect.top() - bounds.top()) / TILE_SIZE)
+        bottom = math.ceil((rect.bottom() - bounds.top()) / TILE_SIZE)
+
+        return [(column, row) for row in range(top, bottom)
+                for column in range(left, right)]
+
+
+    def tile_rect(self, position):
+        """
+        rect of a tile in the space of the layer
+        """
+
+        (column, row) = position
+        bounds = self.composited_bounds()
+
+        return skia.Rect.MakeXYWH(
+            bounds.left() + column * TILE_SIZE,
+            bounds.top() + row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+    
+
+    def raster(self, viewport):
+        """
+        raster the tiles near the viewport which are missing, 
+        because they are new, changed or were evicted
+        """
+
+        bounds = self.composited_bounds()
         if bounds.isEmpty(): return
-        irect = bounds.roundOut()
 
-        # create surface if there is none
-        if not self.surface:
-            self.surface = skia.Surface.MakeRenderTarget(
-                self.skia_context, skia.Budgeted.kNo,
-                skia.ImageInfo.MakeN32Premul(
-                    irect.width(), irect.height()))
-            
-            if not self.surface:
-                self.surface = skia.Surface(irect.width(), irect.height())
-            
-            assert self.surface
-
-        canvas = self.surface.getCanvas()
+        viewport = absolute_to_local(self.display_items[0], viewport)
+
+        # a screen above & below the viewport is rastered 
+        # as well, so scrolling does not wait for raster
+        interest_rect = viewport.makeOutset(0, viewport.height())
+        if not interest_rect.intersect(bounds): return
+
+        for position in self.tiles_in(interest_rect):
+            if position in self.tiles:
+                TILE_CACHE.use(self.tiles, position)
+
+            else:
+                self.raster_tile(position)
+
+
+    def raster_tile(self, position):
+        """
+        draw display list items of a tile onto a surface of its own
+        """
+
+        rect = self.tile_rect(position)
+
+        surface = skia.Surface.MakeRenderTarget(
+            self.skia_context, skia.Budgeted.kNo,
+            skia.ImageInfo.MakeN32Premul(TILE_SIZE, TILE_SIZE))
+        
+        if not surface:
+            surface = skia.Surface(TILE_SIZE, TILE_SIZE)
+
+        assert surface
+
+        canvas = surface.getCanvas()
         canvas.clear(skia.ColorTRANSPARENT)
         canvas.save()
-        canvas.translate(-bounds.left(), -bounds.top())
+        canvas.translate(-rect.left(), -rect.top())
 
         # draw display list items to canvas
-        for item in self.display_items:
+        for item in self.items_in(rect):
             item.execute(canvas)
 
         canvas.restore()
 
-        # use to draw bounds of the composited layer
-        if SHOW_COMPOSITED_LAYER_BORDERS:
-            border_rect = skia.Rect.MakeXYWH(1, 1, irect.width() - 2, irect.height() - 2)
-            DrawOutline(border_rect, "red", 1).execute(canvas)
+        TILE_CACHE.add(self.tiles, position, surface)
+
+
+    def invalidate(self, rect):
+        """
+        drop the tiles under rect, they are rastered again when needed
+        """
+
+        for position in self.tiles_in(rect):
+            TILE_CACHE.remove(self.tiles, position)
+
+
+    def replaces(self, layer):
+        """
+        whether this layer paints in the same space as an older 
+        layer, which is when both are under effects of the same node
+        """
+
+        if not self.parent or not layer.parent:
+            return self.parent is layer.parent
+        
+        return type(self.parent) is type(layer.parent) and \
+            self.parent.node is layer.parent.node
+
+
+    def adopt_tiles(self, layer):
+        """
+        take over the tiles of an older layer this one replaces. 
+        only tiles under display items which changed are dropped.
+        returns the parts of the page which look different now
+        """
+
+        # the same tiles are drawn elsewhere or differently
+        if not same_effects(self.effects, layer.effects):
+            damage = [layer.absolute_composited_bounds(), 
+                      self.absolute_composited_bounds()]
+
+        else:
+            damage = []
+
+        old_bounds = layer.composited_bounds()
+        bounds = self.composited_bounds()
+
+        old_items = set(map(id, layer.display_items))
+        new_items = set(map(id, self.display_items))
+
+        # tiles are placed from the top left of the layer, and
+        # items both layers paint must be painted in the same order
+        if old_bounds.left() != bounds.left() or \
+            old_bounds.top() != bounds.top() or \
+            [item for item in layer.display_items if id(item) in new_items] != \
+            [item for item in self.display_items if id(item) in old_items]:
+
+            layer.release()
+            return [layer.absolute_composited_bounds(), 
+                    self.absolute_composited_bounds()]
+
+        self.tiles = layer.tiles
+        layer.tiles = {}
+
+        changed = [(layer, item) for item in layer.display_items if id(item) not in new_items] + \
+                  [(self, item) for item in self.display_items if id(item) not in old_items]
+
+        for owner, item in changed:
+            rect = owner.item_bounds(item).makeOutset(DAMAGE_MARGIN, DAMAGE_MARGIN)
+            self.invalidate(rect)
+            damage.append(owner.to_absolute(rect))
+
+        return damage
+
+
+    def release(self):
+        """
+        drop the tiles of a layer which is not used anymore
+        """
+
+        TILE_CACHE.remove_all(self.tiles)
 
 
     def add(self, display_item):
@@ -104,6 +305,9 @@ class CompositedLayer:
 
         assert self.can_merge(display_item)
         self.display_items.append(display_item)
+        self.bounds = None
+        self.item_rects = None
+        self.index = None
 
 
     def can_merge(self, display_item):
@@ -147,9 +351,29 @@ class DrawCompositedLayer(PaintCommand):
         """
 
         layer = self.composited_layer
-        if not layer.surface: return
         bounds = layer.composited_bounds()
-        layer.surface.draw(canvas, bounds.left(), bounds.top())
+        irect = bounds.roundOut()
+
+        # tiles at the edges reach outside of the layer
+        canvas.save()
+        canvas.clipRect(skia.Rect.MakeXYWH(
+            bounds.left(), bounds.top(), irect.width(), irect.height()))
+
+        # only tiles in the visible part of the canvas are drawn
+        for position in layer.tiles_in(canvas.getLocalClipBounds()):
+            surface = layer.tiles.get(position)
+            if not surface: continue
+
+            rect = layer.tile_rect(position)
+            surface.draw(canvas, rect.left(), rect.top())
+
+        canvas.restore()
+
+        # use to draw bounds of the composited layer
+        if SHOW_COMPOSITED_LAYER_BORDERS:
+            border_rect = skia.Rect.MakeXYWH(bounds.left() + 1, bounds.top() + 1,
+                                             irect.width() - 2, irect.height() - 2)
+            DrawOutline(border_rect, "red", 1).execute(canvas)
 
 
     def __repr__(self) -> str:
@@ -176,7 +400,9 @@ class NumericAnimation:
         """
 
         self.frame_count += 1
-        if self.frame_count >= self.num_frames: return
+
+        # last frame lands exactly on the new value
+        if self.frame_count > self.num_frames: return
         current_value = self.old_value + self.change_per_frame * self.frame_count
 
         return str(current_value)
@@ -192,6 +418,10 @@ class Transform(VisualEffect):
         self.self_rect = rect
         self.translation = translation
 
+        # the children are drawn moved, so that is where the transform
+        # paints in the space of its parent. layers use it to cull items
+        self.rect = map_translation(self.rect, translation)
+
 
     def execute(self, canvas):
         """
@@ -210,6 +440,15 @@ class Transform(VisualEffect):
             canvas.restore()
 
 
+    def same_as(self, effect):
+        """
+        whether an effect moves its children the same way
+        """
+
+        return isinstance(effect, Transform) and effect.node is self.node \
+            and effect.translation == self.translation
+
+
     def clone(self, child):
         """
         create a copy of the transform
@@ -282,9 +521,31 @@ def parse_transform(transform_str):
     left_paren = transform_str.find('(')
     right_paren = transform_str.find(')')
 
-    (x_px, y_px) = transform_str[left_paren + 1: right_paren].split(",")
+    args = transform_str[left_paren + 1: right_paren].split(",")
 
-    return (float(x_px[-2:]), float(y_px[-2:]))
+    # translations we cannot resolve are ignored
+    # rather than failing the style pass
+    if len(args) != 2:
+        return None
+
+    x, y = parse_px(args[0], None), parse_px(args[1], None)
+
+    if x is None or y is None:
+        return None
+
+    return (x, y)
+
+
+def same_effects(effects, other_effects):
+    """
+    whether two chains of visual effects draw the same way
+    """
+
+    if len(effects) != len(other_effects):
+        return False
+
+    return all([effect is other or effect.same_as(other)
+                for effect, other in zip(effects, other_effects)])
 
 
 def map_translation(rect, translation, reversed=False):
@@ -316,10 +577,18 @@ def absolute_bounds_for_obj(obj):
     rect = skia.Rect.MakeXYWH(
         obj.x, obj.y, obj.width, obj.height)
 
-    cur = obj.node
+    return absolute_bounds(rect, obj.node)
+
+
+def absolute_bounds(rect, node):
+    """
+    apply transformations of a node and its parents on a rect
+    """
+
+    cur = node
 
     while cur:
-        rect = map_translation(rect, parse_transform(cur.style.get("transform", "")))
+        rect = map_translation(rect, cur.computed_style.translation)
         cur = cur.parent
 
     return rect
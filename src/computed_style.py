@@ -0,0 +1,42 @@
+from compositing import parse_transform
+from helpers import parse_color, parse_number, parse_px
+
+
+class ComputedStyle:
+    """
+    Typed view of a node's computed style. Values layout & paint need
+    are resolved once per style pass instead of parsing strings per word
+    """
+
+    __slots__ = (
+        "font_size", "font_weight", "font_style", "color",
+        "background_color", "border_radius", "opacity",
+        "translation", "blend_mode", "clips",
+    )
+
+    def __init__(self, style) -> None:
+
+        # font size in points, css pixels are 3/4 of a point
+        self.font_size = int(float(style["font-size"][:-2]) * .75)
+        self.font_weight = style["font-weight"]
+        self.font_style = style["font-style"]
+        self.color = parse_color(style["color"])
+
+        # None for a transparent background, nothing gets drawn then
+        bg_color = style.get("background-color", "transparent")
+        self.background_color = None if bg_color == "transparent" else parse_color(bg_color)
+
+        # values in units we do not support fall back to their
+        # defaults, so one bad declaration cannot fail the page
+        self.border_radius = parse_px(style.get("border-radius", "0px"), 0.0)
+
+        # visual effects
+        self.opacity = parse_number(style.get("opacity", "1.0"), 1.0)
+        self.translation = parse_transform(style.get("transform", ""))
+        self.blend_mode = style.get("mix-blend-mode")
+        self.clips = style.get("overflow", "visible") == "clip"
+
+
+    def __repr__(self):
+        return f"ComputedStyle(font_size={self.font_size}, font_weight={self.font_weight}, \
+            font_style={self.font_style}, opacity={self.opacity})"
@@ -2,4 +2,13 @@
 SHOW_COMPOSITED_LAYER_BORDERS = False
 
 # COMPOSITING
-USE_COMPOSITING = True
\ No newline at end of file
+USE_COMPOSITING = True
+
+# memory for rastered tiles of composited layers
+TILE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# HTTP CACHE
+HTTP_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# directory for the on-disk cache tier, None keeps the cache in memory only
+HTTP_CACHE_DIR = None
\ No newline at end of file
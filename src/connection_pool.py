@@ -0,0 +1,197 @@
+import socket
+import ssl
+import threading
+import time
+
+
+# max number of sockets kept open to a single (scheme, host, port)
+MAX_CONNECTIONS_PER_HOST = 6
+
+# idle sockets older than this are closed instead of being reused
+IDLE_TIMEOUT_SEC = 30
+
+
+class Connection:
+    def __init__(self, scheme, host, port) -> None:
+        self.key = (scheme, host, port)
+
+        # setting up connection to host
+        s = socket.socket(
+            # to specify that socket will use IPv4
+            family=socket.AF_INET,
+            # to specify that socket can send random amount of data
+            type=socket.SOCK_STREAM,
+            # to specify protocol to be used while setting connection
+            proto=socket.IPPROTO_TCP
+        )
+
+        s.connect((host, port))
+
+        if scheme == "https":
+            ctx = ssl.create_default_context()
+            s = ctx.wrap_socket(s, server_hostname=host)
+
+        self.socket = s
+
+        # we wrap socket into a file-like object so we can read data from it.
+        # the file is kept for the lifetime of the socket since it buffers
+        # bytes which might belong to the next response on this connection
+        self.response = s.makefile("rb")
+
+        self.last_used = time.monotonic()
+
+        # set when the connection is handed out again from the pool,
+        # a reused socket may have been closed by the server meanwhile
+        self.reused = False
+
+
+    def send(self, data: bytes):
+        """
+        send request bytes over the socket
+        """
+
+        self.socket.sendall(data)
+
+
+    def close(self):
+        """
+        close the socket and its file wrapper
+        """
+
+        try:
+            self.response.close()
+            self.socket.close()
+
+        except OSError:
+            pass
+
+
+    def __repr__(self):
+        scheme, host, port = self.key
+        return f"Connection({scheme}://{host}:{port}, reused={self.reused})"
+
+
+class ConnectionPool:
+    """
+    Keeps HTTP/1.1 keep-alive sockets around so that subsequent requests
+    to the same origin can skip the TCP (and TLS) handshake
+    """
+
+    def __init__(self, max_per_host=MAX_CONNECTIONS_PER_HOST,
+                 idle_timeout=IDLE_TIMEOUT_SEC) -> None:
+
+        self.condition = threading.Condition()
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+
+        # idle sockets per (scheme, host, port)
+        self.idle = {}
+
+        # number of sockets open per (scheme, host, port), idle or in use
+        self.open_count = {}
+
+
+    def acquire(self, scheme, host, port):
+        """
+        hands out an idle connection for the origin if there is one,
+        otherwise opens a new one. blocks when the per host cap is reached
+        """
+
+        key = (scheme, host, port)
+
+        self.condition.acquire(blocking=True)
+
+        while True:
+            self.evict_idle()
+
+            idle = self.idle.get(key)
+
+            # most recently used socket is least likely to have timed out
+            if idle:
+                connection = idle.pop()
+                connection.reused = True
+                self.condition.release()
+                return connection
+
+            if self.open_count.get(key, 0) < self.max_per_host:
+                self.open_count[key] = self.open_count.get(key, 0) + 1
+                break
+
+            # wait for another request to hand back its connection
+            self.condition.wait()
+
+        self.condition.release()
+
+        # connect outside of the lock since handshakes can be slow
+        try:
+            return Connection(scheme, host, port)
+
+        except Exception:
+            self.condition.acquire(blocking=True)
+            self.open_count[key] -= 1
+            self.condition.notify_all()
+            self.condition.release()
+            raise
+
+
+    def release(self, connection, reusable):
+        """
+        return a connection to the pool once its response has been
+        fully read, or close it if the server does not keep it alive
+        """
+
+        self.condition.acquire(blocking=True)
+
+        if reusable:
+            connection.last_used = time.monotonic()
+            self.idle.setdefault(connection.key, []).append(connection)
+
+        else:
+            connection.close()
+            self.open_count[connection.key] -= 1
+
+        self.condition.notify_all()
+        self.condition.release()
+
+
+    def evict_idle(self):
+        """
+        close sockets which have been idle for longer than the timeout.
+        expects the pool lock to be held by the caller
+        """
+
+        now = time.monotonic()
+
+        for key, connections in self.idle.items():
+            fresh = []
+
+            for connection in connections:
+                if now - connection.last_used > self.idle_timeout:
+                    connection.close()
+                    self.open_count[key] -= 1
+
+                else:
+                    fresh.append(connection)
+
+            self.idle[key] = fresh
+
+
+    def close_all(self):
+        """
+        close all idle sockets held by the pool
+        """
+
+        self.condition.acquire(blocking=True)
+
+        for key, connections in self.idle.items():
+            for connection in connections:
+                connection.close()
+                self.open_count[key] -= 1
+
+        self.idle = {}
+        self.condition.notify_all()
+        self.condition.release()
+
+
+    def __repr__(self):
+        return f"ConnectionPool(open={self.open_count})"
@@ -1,7 +1,12 @@
-from element import Element
+from functools import lru_cache
+from types import MappingProxyType
+
+from element import Element, EMPTY_ANIMATIONS
 from tag_selector import TagSelector
 from descendent_selector import DescendantSelector
 from compositing import NumericAnimation
+from computed_style import ComputedStyle
+from helpers import mark_needs_layout
 
 
 INHERITED_PROPERTIES = {
@@ -12,6 +17,9 @@ INHERITED_PROPERTIES = {
 }
 REFRESH_RATE_SEC = 0.033
 
+# number of distinct style attributes kept parsed
+INLINE_STYLE_CACHE_SIZE = 1024
+
 
 class CSSParser:
     def __init__(self, s: str):
@@ -183,6 +191,16 @@ class CSSParser:
         return self.s[start:self.i]
     
 
+@lru_cache(maxsize=INLINE_STYLE_CACHE_SIZE)
+def parse_inline_style(text):
+    """
+    parses the style attribute of an element. results are read-only 
+    since they are shared by every element with the same attribute
+    """
+
+    return MappingProxyType(CSSParser(text).body())
+
+
 def parse_transition(value):
     """
     parsing function in transform css property.
@@ -203,61 +221,153 @@ def parse_transition(value):
     return properties
 
 
-def style(node, rules, tab):
+def style(node, stylesheet, tab, shared_styles=None):
+    """
+    parses attributes of a node and add them as style property.
+    only nodes flagged with mark_needs_style are restyled, 
+    subtrees without any flagged node are skipped
+    """
+
+    # computed styles shared by nodes during this pass, see restyle
+    if shared_styles is None:
+        shared_styles = {}
+
+    if node.needs_style:
+        restyle(node, stylesheet, tab, shared_styles)
+
+    if not node.children_need_style: return
+
+    # we recursively apply the styling info
+    for child in node.children:
+        if child.needs_style or child.children_need_style:
+            style(child, stylesheet, tab, shared_styles)
+
+    node.children_need_style = False
+
+
+def restyle(node, stylesheet, tab, shared_styles):
     """
-    parses attributes of a node and add them as style property
+    computes the style of a single node. nodes with the same parent 
+    style, tag and style attribute end up with the same style, so 
+    they share a single read-only style object
     """
     
     old_style = node.style
-    node.style = {}
+    node.needs_style = False
+
+    # a restyled node might have a different size now
+    mark_needs_layout(node)
+
+    parent_style = node.parent.style if node.parent else None
+
+    if isinstance(node, Element):
+        key = (id(parent_style), node.tag, node.attributes.get("style"))
+
+    else:
+        key = (id(parent_style), None, None)
+
+    # a parent style object is only shared between nodes with the same 
+    # tag and ancestors, so descendant selectors match the same way too.
+    # the parent style is kept in the value so that its id stays unique
+    if key in shared_styles:
+        _, node.style, node.computed_style = shared_styles[key]
+
+    else:
+        node.style = MappingProxyType(compute_style(node, stylesheet))
+        node.computed_style = ComputedStyle(node.style)
+        shared_styles[key] = (parent_style, node.style, node.computed_style)
+
+    # if we have an old style, check difference and re-render
+    if old_style:
+        transitions = diff_styles(old_style, node.style)
+
+        for property, (old_value, new_value, num_frames) in transitions.items():
+            if property == "opacity":
+                tab.set_needs_render()
+                animation = NumericAnimation(old_value, new_value, num_frames)
+
+                # nodes share an empty read-only default until they animate
+                if node.animations is EMPTY_ANIMATIONS:
+                    node.animations = {}
+
+                node.animations[property] = animation
+
+                # animating nodes get a style of their own
+                node.style = MappingProxyType({**node.style, property: animation.animate()})
+                node.computed_style = ComputedStyle(node.style)
+
+    # children inherit from this node, so they only need 
+    # a restyle when an inherited property has changed
+    for prop in INHERITED_PROPERTIES:
+        if node.style[prop] != old_style.get(prop):
+            for child in node.children:
+                child.needs_style = True
+
+            if node.children: node.children_need_style = True
+            break
+
+
+def compute_style(node, stylesheet):
+    """
+    applies inherited properties, stylesheet rules and the 
+    style attribute of a node, returns the resulting properties
+    """
+
+    node_style = {}
     
     # we apply the inherited properties
     for prop, default_val in INHERITED_PROPERTIES.items():
         if node.parent:
-            node.style[prop] = node.parent.style[prop]
+            node_style[prop] = node.parent.style[prop]
         else:
-            node.style[prop] = default_val
+            node_style[prop] = default_val
 
-    # we iterate over the set of rules from stylesheets - browser and content
-    for selector, body in rules:
-        if not selector.matches(node): continue
-        for prop, value in body.items():
-            node.style[prop] = value
+    # we iterate over the set of rules from stylesheets - browser and content.
+    # only rules whose rightmost selector is the node's tag can match it
+    if isinstance(node, Element):
+        for selector, body in stylesheet.rules_for(node.tag):
+            if not selector.matches(node): continue
+            for prop, value in body.items():
+                node_style[prop] = value
 
     # we get styling information of the html node's attribute,
-    # parse and add it into the styling info
+    # parse and add it into the styling info. the parsed attribute 
+    # is kept on the node, so it is only parsed again when it changes
     if isinstance(node, Element) and "style" in node.attributes:
-        pairs = CSSParser(node.attributes["style"]).body()
+        if node.inline_style is None:
+            node.inline_style = parse_inline_style(node.attributes["style"])
 
-        for prop, value in pairs.items():
-            node.style[prop] = value
+        for prop, value in node.inline_style.items():
+            node_style[prop] = value
 
     # we resolve font-size info from percentage to pixel
-    if node.style["font-size"].endswith("%"):
+    if node_style["font-size"].endswith("%"):
         if node.parent:
             parent_font_size = node.parent.style["font-size"]
         
         else:
             parent_font_size = INHERITED_PROPERTIES["font-size"]
 
-        node_pct = float(node.style["font-size"][:-1]) / 100
+        node_pct = float(node_style["font-size"][:-1]) / 100
         parent_px = float(parent_font_size[:-2])
-        node.style["font-size"] = str(node_pct * parent_px) + "px"
+        node_style["font-size"] = str(node_pct * parent_px) + "px"
 
-    # if we have an old style, check difference and re-render
-    if old_style:
-        transitions = diff_styles(old_style, node.style)
+    return node_style
 
-        for property, (old_value, new_value, num_frames) in transitions.items():
-            if property == "opacity":
-                tab.set_needs_render()
-                animation = NumericAnimation(old_value, new_value, num_frames)
-                node.animations["property"] = animation
-                node.style[property] = animation.animate()
 
-    # we recursively apply the styling info
-    for child in node.children:
-        style(child, rules, tab)
+def mark_needs_style(node):
+    """
+    flag a node for restyle and let its ancestors know, 
+    so that style can find it without visiting clean subtrees
+    """
+
+    node.needs_style = True
+    parent = node.parent
+
+    # an ancestor which is already flagged has flagged its ancestors too
+    while parent and not parent.children_need_style:
+        parent.children_need_style = True
+        parent = parent.parent
 
 
 def cascade_priority(rule):
@@ -17,14 +17,21 @@ class DocumentLayout:
         self.height = 0
         self.width = 0
 
+        # cached paint commands, see paint_tree
+        self.display_list = None
+
 
     def layout(self):
         """
-        builds the layout tree
+        builds the layout tree, or updates it where nodes are dirty
         """
 
-        child = BlockLayout(self.node, self, None)
-        self.children.append(child)
+        # the layout tree is kept between renders
+        if not self.children:
+            self.children.append(BlockLayout(self.node, self, None))
+
+        child = self.children[0]
+        self.display_list = None
 
         self.width = WIDTH - 2 * HSTEP
         self.x = HSTEP
@@ -1,18 +1,24 @@
 import skia
-from helpers import parse_color
+from helpers import parse_color, font_metrics
 from compositing import PaintCommand
 
 
 class DrawText(PaintCommand):
     def __init__(self, x1: int, y1: int,
-                 text: str, font, color: str):
+                 text: str, font, color: str, width=None):
 
         self.text = text
         self.color = color
         self.font = font
+        self.metrics = font_metrics(font)
+
+        # layout already knows the width of words
+        if width is None:
+            width = font.measureText(text)
+
         super().__init__(skia.Rect.MakeLTRB(x1, y1,
-            x1 + font.measureText(text),
-            y1 - font.getMetrics().fAscent + font.getMetrics().fDescent))
+            x1 + width,
+            y1 + self.metrics.linespace))
 
 
     def execute(self, canvas):
@@ -23,7 +29,7 @@ class DrawText(PaintCommand):
         paint = skia.Paint(AntiAlias=True,
                            Color=parse_color(self.color))
         
-        baseline = self.rect.top() - self.font.getMetrics().fAscent
+        baseline = self.rect.top() - self.metrics.ascent
 
         canvas.drawString(self.text, float(self.rect.left()), 
                           baseline, self.font, paint)
@@ -33,6 +39,59 @@ class DrawText(PaintCommand):
         return f"DrawText(text={self.text})"
 
 
+class DrawTextBlob(PaintCommand):
+    """
+    Draws a run of words with the same font & color on one line,
+    the glyphs of all words go into a single skia.TextBlob
+    """
+
+    def __init__(self, y1: int, words, xs, widths, font, color: str):
+
+        self.words = words
+        self.color = color
+        self.font = font
+        self.metrics = font_metrics(font)
+
+        baseline = y1 - self.metrics.ascent
+        glyphs = font.textToGlyphs("".join(words))
+        advances = font.getWidths(glyphs)
+
+        # glyphs of a word start at the x of the word and
+        # follow each other by their advance, like drawString does
+        positions = []
+        i = 0
+
+        for word, x in zip(words, xs):
+            for advance in advances[i:i + len(word)]:
+                positions.append(x)
+                x += advance
+
+            i += len(word)
+
+        builder = skia.TextBlobBuilder()
+        builder.allocRunPosH(font, glyphs, positions, baseline)
+        self.blob = builder.make()
+
+        # paint does not change, so it is created once instead of every raster
+        self.paint = skia.Paint(AntiAlias=True, Color=parse_color(color))
+
+        super().__init__(skia.Rect.MakeLTRB(xs[0], y1,
+            xs[-1] + widths[-1],
+            y1 + self.metrics.linespace))
+
+
+    def execute(self, canvas):
+        """
+        draw the text blob on canvas
+        """
+
+        canvas.drawTextBlob(self.blob, 0, 0, self.paint)
+
+
+    def __repr__(self):
+        return f"DrawTextBlob(text={' '.join(self.words)})"
+
+
 class DrawRect(PaintCommand):
     def __init__(self, rect, color: str) -> None:
 
@@ -1,12 +1,80 @@
+from types import MappingProxyType
+
+
+# shared read-only defaults, so that nodes which never get 
+# children, style or animations do not allocate their own
+EMPTY_CHILDREN = ()
+EMPTY_STYLE = MappingProxyType({})
+EMPTY_ANIMATIONS = MappingProxyType({})
+
+# elements laid out as blocks, an element with one of 
+# these as a child is laid out in block mode itself
+BLOCK_ELEMENTS = frozenset([
+    "html", "body", "article", "section", "nav", "aside",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hgroup", "header",
+    "footer", "address", "p", "hr", "pre", "blockquote",
+    "ol", "ul", "menu", "li", "dl", "dt", "dd", "figure",
+    "figcaption", "main", "div", "table", "form", "fieldset",
+    "legend", "details", "summary"
+])
+
+
 class Element:
+    __slots__ = (
+        "tag", "children", "parent", "attributes", 
+        "style", "is_focused", "animations", "blend_op",
+        "computed_style", "needs_style", "children_need_style", "inline_style",
+        "needs_layout", "children_need_layout", "has_block_child",
+        "layout_object",
+    )
+
     def __init__(self, tag, attributes, parent):
         self.tag = tag
         self.children = []
         self.parent = parent
         self.attributes = attributes
-        self.style = {}
+        self.style = EMPTY_STYLE
+        self.computed_style = None
         self.is_focused = False
-        self.animations = {}
+        self.animations = EMPTY_ANIMATIONS
+
+        # parsed style attribute, filled in lazily by style
+        self.inline_style = None
+
+        # dirty bits for style, new nodes need to be styled along with 
+        # everything below them
+        self.needs_style = True
+        self.children_need_style = True
+        self.needs_layout = True
+        self.children_need_layout = True
+
+        # kept up to date by append_child & set_children, 
+        # so layout does not have to scan the children
+        self.has_block_child = False
+
+        # layout object painting the element, None for inline elements
+        self.layout_object = None
+
+
+    def append_child(self, child):
+        """
+        add a child at the end of the children
+        """
+
+        self.children.append(child)
+
+        if isinstance(child, Element) and child.tag in BLOCK_ELEMENTS:
+            self.has_block_child = True
+
+
+    def set_children(self, children):
+        """
+        replace all children of the element
+        """
+
+        self.children = children
+        self.has_block_child = any(isinstance(child, Element) and 
+                                   child.tag in BLOCK_ELEMENTS for child in children)
 
 
     def __repr__(self):
@@ -1,8 +1,29 @@
 import skia
+import threading
+from collections import namedtuple, OrderedDict
 
 
+# (weight, style) -> skia.Typeface
 FONTS = {}
 
+# (size, weight, style) -> skia.Font
+SIZED_FONTS = {}
+
+# id of a cached skia.Font -> FontMetrics, cached fonts are never 
+# freed so their ids can not be taken by another font
+FONT_METRICS = {}
+
+# metrics layout & paint need for every word, ascent is negative like in skia
+FontMetrics = namedtuple("FontMetrics", ["ascent", "descent", "linespace", "space_width"])
+
+# max number of (font, word) widths kept around
+WORD_WIDTH_CACHE_SIZE = 100_000
+
+# (id of a cached skia.Font, word) -> width, least recently used first.
+# shared by the main threads of all tabs, which lay out concurrently
+WORD_WIDTHS = OrderedDict()
+WORD_WIDTHS_LOCK = threading.Lock()
+
 
 def print_tree(node, indent=0):
     """
@@ -15,9 +36,17 @@ def print_tree(node, indent=0):
 
 def paint_tree(layout_object, display_list):
     """
-    traverse layout objects compute DrawText, DrawRect nodes
+    traverse layout objects compute DrawText, DrawRect nodes.
+    the commands of each layout object are cached until
+    mark_needs_paint or a new layout throws them away
     """
 
+    if layout_object.display_list is not None:
+        display_list.extend(layout_object.display_list)
+        return
+
+    cmds = []
+
     # check if a layout object should be painted or not
     # important to check for input / button html elements
     if layout_object.should_paint():
@@ -29,15 +58,39 @@ def paint_tree(layout_object, display_list):
     if layout_object.should_paint():
         cmds = layout_object.paint_effects(cmds)
 
+    layout_object.display_list = cmds
     display_list.extend(cmds)
 
 
+def mark_needs_paint(node):
+    """
+    throw away the cached commands of the layout object which paints 
+    a node, and of all layout objects containing it
+    """
+
+    # inline elements are painted by the block they are in
+    while node and node.layout_object is None:
+        node = node.parent
+
+    if not node: return
+
+    layout_object = node.layout_object
+
+    while layout_object:
+        layout_object.display_list = None
+        layout_object = layout_object.parent
+
+
 def get_font(size, weight, style):
     """
     caching fonts to reuse instead of creating new objects. 
     cheaper when we have a lot of text and font repeating frequently
     """
 
+    sized_key = (size, weight, style)
+    font = SIZED_FONTS.get(sized_key)
+    if font: return font
+
     key = (weight, style)
 
     if key not in FONTS:
@@ -59,7 +112,129 @@ def get_font(size, weight, style):
         font = skia.Typeface('Aria', style_info)
         FONTS[key] = font
 
-    return skia.Font(FONTS[key], size)
+    # the browser & main thread both create fonts, only the font
+    # which ends up in the cache gets its metrics cached
+    font = SIZED_FONTS.setdefault(sized_key, skia.Font(FONTS[key], size))
+
+    if id(font) not in FONT_METRICS:
+        FONT_METRICS[id(font)] = measure_font(font)
+
+    return font
+
+
+def font_metrics(font):
+    """
+    returns metrics of a font, cached for fonts from get_font
+    """
+
+    metrics = FONT_METRICS.get(id(font))
+    if metrics: return metrics
+
+    return measure_font(font)
+
+
+def measure_font(font):
+    """
+    ask skia for the metrics of a font
+    """
+
+    metrics = font.getMetrics()
+
+    return FontMetrics(metrics.fAscent, metrics.fDescent, 
+                       metrics.fDescent - metrics.fAscent, font.measureText(" "))
+
+
+def measure_words(font, words):
+    """
+    returns the widths of words in a font. words which are not cached
+    yet are measured together with a single call into skia
+    """
+
+    # widths are only cached for fonts from get_font
+    if id(font) not in FONT_METRICS:
+        return [font.measureText(word) for word in words]
+
+    font_id = id(font)
+    widths = []
+    missing = {}
+
+    with WORD_WIDTHS_LOCK:
+        for word in words:
+            key = (font_id, word)
+            width = WORD_WIDTHS.get(key)
+
+            if width is None:
+                missing[word] = None
+
+            else:
+                WORD_WIDTHS.move_to_end(key)
+
+            widths.append(width)
+
+    if not missing: return widths
+
+    # one glyph per code point, so glyph widths can be 
+    # summed back up into per word widths
+    glyphs = font.textToGlyphs("".join(missing))
+    glyph_widths = font.getWidths(glyphs)
+
+    start = 0
+    for word in missing:
+        end = start + len(word)
+        missing[word] = sum(glyph_widths[start:end])
+        start = end
+
+    # measuring is done outside of the lock, so tabs only 
+    # wait on each other for the dict operations
+    with WORD_WIDTHS_LOCK:
+        for word, width in missing.items():
+            WORD_WIDTHS[(font_id, word)] = width
+
+        while len(WORD_WIDTHS) > WORD_WIDTH_CACHE_SIZE:
+            WORD_WIDTHS.popitem(last=False)
+
+    return [missing[word] if width is None else width 
+            for word, width in zip(words, widths)]
+
+
+def mark_needs_layout(node):
+    """
+    flag a node for layout and let its ancestors know, 
+    so that layout can find it without visiting clean subtrees
+    """
+
+    node.needs_layout = True
+    parent = node.parent
+
+    # an ancestor which is already flagged has flagged its ancestors too
+    while parent and not parent.children_need_layout:
+        parent.children_need_layout = True
+        parent = parent.parent
+
+
+def clear_needs_layout(node):
+    """
+    reset layout dirty bits of a node once it has been laid out
+    """
+
+    node.needs_layout = False
+
+    if node.children_need_layout:
+        node.children_need_layout = False
+
+
+def shift_tree(layout_object, dy):
+    """
+    move a laid out subtree down by dy
+    """
+
+    layout_object.y += dy
+
+    # cached commands have the old position baked in
+    layout_object.display_list = None
+
+    for child in layout_object.children:
+        shift_tree(child, dy)
 
 
 def tree_to_list(tree, list):
@@ -91,6 +266,10 @@ def parse_color(color):
     parse color hex/string to skia color
     """
 
+    # colors resolved by the cascade are already skia colors
+    if isinstance(color, int):
+        return color
+
     if color.startswith("#") and len(color) == 7:
         r = int(color[1:3], 16)
         g = int(color[3:5], 16)
@@ -113,13 +292,42 @@ def parse_color(color):
         return skia.ColorBLACK
 
 
+def parse_px(value, default):
+    """
+    parse a length in css pixels. other units are not supported, 
+    so default is returned for them like for malformed values
+    """
+
+    value = value.strip()
+
+    if value.endswith("px"):
+        try:
+            return float(value[:-2])
+
+        except ValueError:
+            pass
+
+    return default
+
+
+def parse_number(value, default):
+    """
+    parse a plain number like opacity, default for malformed values
+    """
+
+    try:
+        return float(value)
+
+    except ValueError:
+        return default
+
+
 def linespace(font):
     """
     get font height for a given font
     """
 
-    metrics = font.getMetrics()
-    return metrics.fDescent - metrics.fAscent
+    return font_metrics(font).linespace
 
 
 def add_parent_pointers(nodes, parent=None):
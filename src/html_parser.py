@@ -1,21 +1,41 @@
+import re
+import sys
+
 from text import Text
-from element import Element
+from element import Element, EMPTY_CHILDREN
+
+
+# characters which start or end a tag
+TAG_DELIMITERS = re.compile("[<>]")
+
+# insertion modes, they decide which implicit tags are added
+BEFORE_HTML = "before-html"
+BEFORE_HEAD = "before-head"
+IN_HEAD = "in-head"
+IN_BODY = "in-body"
 
 
 class HTMLParser:
-    def __init__(self, body):
+    SELF_CLOSING_TAGS = frozenset([
+        "area", "base", "br", "col", "embed", "hr", "img", "input",
+        "link", "meta", "param", "source", "track", "wbr",
+    ])
+
+    HEAD_TAGS = frozenset([
+        "base", "basefont", "bgsound", "noscript",
+        "link", "meta", "title", "style", "script",
+    ])
+
+    def __init__(self, body=""):
         self.body = body
         self.unfinished = []
 
-        self.SELF_CLOSING_TAGS = [
-            "area", "base", "br", "col", "embed", "hr", "img", "input",
-            "link", "meta", "param", "source", "track", "wbr",
-        ]
+        # tokenizer state carried over between chunks
+        self.in_tag = False
+        self.pending = []
 
-        self.HEAD_TAGS = [
-            "base", "basefont", "bgsound", "noscript",
-            "link", "meta", "title", "style", "script",
-        ]
+        # tree builder state, kept in sync with self.unfinished
+        self.mode = BEFORE_HTML
 
 
     def parse(self):
@@ -23,27 +43,46 @@ class HTMLParser:
         parse page content to create tree of html nodes
         """
 
-        text: str = ""
-        in_tag: bool = False
-        for c in self.body:
+        self.feed(self.body)
 
-            if c == "<":
-                in_tag = True
-                if text: self.add_text(text)
-                text = ""
+        return self.finish()
 
-            elif c == ">":
-                in_tag = False
-                self.add_tag(text)
-                text = ""
 
-            else:
-                text += c
+    def feed(self, chunk):
+        """
+        tokenize a chunk of the page as it arrives and add the 
+        tokens to the tree. text or tags cut off at the end of 
+        the chunk are completed by the next chunk
+        """
 
-        if not in_tag and text:
-            self.add_text(text)
+        i = 0
 
-        return self.finish()
+        while True:
+
+            # jump straight to the next tag boundary
+            match = TAG_DELIMITERS.search(chunk, i)
+
+            if not match:
+                if i < len(chunk): self.pending.append(chunk[i:])
+                return
+
+            j = match.start()
+            text = chunk[i:j]
+
+            if self.pending:
+                self.pending.append(text)
+                text = "".join(self.pending)
+                self.pending = []
+
+            if chunk[j] == "<":
+                self.in_tag = True
+                if text: self.add_text(text)
+
+            else:
+                self.in_tag = False
+                self.add_tag(text)
+
+            i = j + 1
     
 
     def add_text(self, text):
@@ -80,16 +119,17 @@ class HTMLParser:
 
             # edge case no unfinished node to add
             if len(self.unfinished) == 1: return
-            node = self.unfinished.pop()
+            node = self.pop()
             parent = self.unfinished[-1]
-            parent.children.append(node)
+            parent.append_child(node)
 
         # self closing tags
         elif tag in self.SELF_CLOSING_TAGS:
 
             parent = self.unfinished[-1]
             node = Element(tag, attributes, parent)
-            parent.children.append(node)
+            node.children = EMPTY_CHILDREN
+            parent.append_child(node)
 
         # opening tag
         else:
@@ -97,7 +137,47 @@ class HTMLParser:
             # edge case since no parent
             parent = self.unfinished[-1] if self.unfinished else None
             node = Element(tag, attributes, parent)
-            self.unfinished.append(node)
+            self.push(node)
+
+
+    def push(self, node):
+        """
+        open a node and update the insertion mode
+        """
+
+        self.unfinished.append(node)
+        self.reset_insertion_mode()
+
+
+    def pop(self):
+        """
+        close the innermost open node and update the insertion mode
+        """
+
+        node = self.unfinished.pop()
+        self.reset_insertion_mode()
+        return node
+
+
+    def reset_insertion_mode(self):
+        """
+        the root is always <html>, so only the first two open 
+        nodes decide the mode. everything deeper is in the body
+        """
+
+        depth = len(self.unfinished)
+
+        if depth == 0:
+            self.mode = BEFORE_HTML
+
+        elif depth == 1:
+            self.mode = BEFORE_HEAD
+
+        elif depth == 2 and self.unfinished[1].tag == "head":
+            self.mode = IN_HEAD
+
+        else:
+            self.mode = IN_BODY
 
 
     def implicit_tags(self, tag):
@@ -106,19 +186,18 @@ class HTMLParser:
         """
         
         while True:
-            open_tags = [node.tag for node in self.unfinished]
 
-            if open_tags == [] and tag != "html":
+            if self.mode == BEFORE_HTML and tag != "html":
                 self.add_tag("html")
 
-            elif open_tags == ["html"] and tag not in ["head", "body", "/html"]:
+            elif self.mode == BEFORE_HEAD and tag not in ["head", "body", "/html"]:
                 if tag in self.HEAD_TAGS:
                     self.add_tag("head")
 
                 else:
                     self.add_tag("body")
 
-            elif open_tags == ["html", "head"] and tag not in ["/head"] + self.HEAD_TAGS:
+            elif self.mode == IN_HEAD and tag != "/head" and tag not in self.HEAD_TAGS:
                 self.add_tag("/head")
 
             else:
@@ -126,19 +205,27 @@ class HTMLParser:
 
     
     def finish(self):
-        # TODO: docstring
-        
+        """
+        close all the tags left open and return the root of the tree
+        """
+
+        # text at the end of the page
+        if not self.in_tag and self.pending:
+            self.add_text("".join(self.pending))
+
+        self.pending = []
+
         # for implicit tags
         if not self.unfinished:
             self.implicit_tags(None)
         
         while len(self.unfinished) > 1:
 
-            node = self.unfinished.pop()
+            node = self.pop()
             parent = self.unfinished[-1]
-            parent.children.append(node)
+            parent.append_child(node)
 
-        return self.unfinished.pop()
+        return self.pop()
     
 
     def get_attributes(self, text: str):
@@ -147,7 +234,10 @@ class HTMLParser:
         """
 
         parts = text.split()
-        tag = parts[0].casefold()
+
+        # tag names & attribute keys repeat a lot, interning them 
+        # makes all nodes share one copy of each string
+        tag = sys.intern(parts[0].casefold())
         attributes = {}
 
         for attrpairs in parts[1:]:
@@ -157,10 +247,10 @@ class HTMLParser:
                 if len(value) > 2 and value[0] in ["'", "\""]:
                     value = value[1:-1]
 
-                attributes[key.casefold()] = value
+                attributes[sys.intern(key.casefold())] = value
 
 
             else:
-                attributes[attrpairs.casefold()] = ""
+                attributes[sys.intern(attrpairs.casefold())] = ""
 
         return tag, attributes
@@ -0,0 +1,375 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    def __init__(self, headers, body) -> None:
+        self.headers = headers
+        self.body = body
+        self.size = len(body.encode("utf8"))
+        self.refresh(headers)
+
+
+    def refresh(self, headers):
+        """
+        update headers & freshness lifetime, used when an entry is
+        stored and when the server revalidates it with a 304
+        """
+
+        self.headers.update(headers)
+        directives = parse_cache_control(self.headers.get("cache-control", ""))
+
+        # no-cache responses may be stored but must be revalidated before use
+        if "no-cache" in directives:
+            max_age = 0
+
+        else:
+            try:
+                max_age = int(directives.get("max-age", "0"))
+
+            except ValueError:
+                max_age = 0
+
+        # age is time the response already spent in other caches
+        try:
+            age = int(self.headers.get("age", "0"))
+
+        except ValueError:
+            age = 0
+
+        self.expires_at = time.time() + max_age - age
+
+
+    def is_fresh(self):
+        """
+        fresh entries can be used without contacting the server
+        """
+
+        return time.time() < self.expires_at
+
+
+    def validators(self):
+        """
+        returns conditional request headers used to revalidate the entry
+        """
+
+        headers = {}
+
+        if "etag" in self.headers:
+            headers["If-None-Match"] = self.headers["etag"]
+
+        if "last-modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+
+        return headers
+
+
+    def __repr__(self):
+        return f"CacheEntry(size={self.size}, fresh={self.is_fresh()})"
+
+
+class HTTPCache:
+    """
+    Caches GET responses in memory with an optional on-disk tier.
+    Entries are evicted least recently used first once the byte budget is exceeded
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=None) -> None:
+        self.lock = threading.Lock()
+        self.max_bytes = max_bytes
+
+        # url -> CacheEntry, ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes or max_bytes
+
+        # file name -> size on disk, ordered from least to most recently used
+        self.disk_entries = OrderedDict()
+        self.disk_size = 0
+
+        if self.disk_dir:
+            self.load_disk_index()
+
+
+    def get(self, url):
+        """
+        lookup an entry in memory and then on disk
+        """
+
+        self.lock.acquire(blocking=True)
+
+        entry = self.entries.get(url)
+
+        if entry:
+            self.entries.move_to_end(url)
+
+        elif self.disk_dir:
+            entry = self.read_disk(url)
+
+            # promote entries found on disk to the memory tier
+            if entry: self.put_memory(url, entry)
+
+        self.lock.release()
+
+        return entry
+
+
+    def lookup(self, url):
+        """
+        returns the entry for a url and whether it is fresh, also updates
+        hit/miss counters. stale entries need to be revalidated with the server
+        """
+
+        entry = self.get(url)
+        fresh = entry is not None and entry.is_fresh()
+
+        self.lock.acquire(blocking=True)
+
+        if fresh:
+            self.hits += 1
+
+        else:
+            self.misses += 1
+
+        self.lock.release()
+
+        return entry, fresh
+
+
+    def store(self, url, status, headers, body):
+        """
+        cache a response if the server allows it
+        """
+
+        if not is_cacheable(status, headers):
+            self.remove(url)
+            return None
+
+        entry = CacheEntry(dict(headers), body)
+
+        self.lock.acquire(blocking=True)
+        self.put_memory(url, entry)
+        if self.disk_dir: self.write_disk(url, entry)
+        self.lock.release()
+
+        return entry
+
+
+    def revalidated(self, url, entry, headers):
+        """
+        server replied 304 not modified, so the cached body can be reused
+        """
+
+        self.lock.acquire(blocking=True)
+        self.revalidations += 1
+        entry.refresh(headers)
+        if self.disk_dir: self.write_disk(url, entry)
+        self.lock.release()
+
+        return entry
+
+
+    def remove(self, url):
+        """
+        drop an entry from both tiers
+        """
+
+        self.lock.acquire(blocking=True)
+
+        entry = self.entries.pop(url, None)
+        if entry: self.size -= entry.size
+
+        if self.disk_dir:
+            self.remove_disk(disk_name(url))
+
+        self.lock.release()
+
+
+    def put_memory(self, url, entry):
+        """
+        insert entry as most recently used and evict entries
+        over the byte budget. expects the lock to be held
+        """
+
+        old = self.entries.pop(url, None)
+        if old: self.size -= old.size
+
+        # entries larger than the whole budget are never cached
+        if entry.size > self.max_bytes: return
+
+        self.entries[url] = entry
+        self.size += entry.size
+
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+
+    def load_disk_index(self):
+        """
+        build the on-disk LRU index from file modification times
+        """
+
+        os.makedirs(self.disk_dir, exist_ok=True)
+
+        files = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self.disk_entries[name] = size
+            self.disk_size += size
+
+
+    def read_disk(self, url):
+        """
+        read an entry from the disk tier. expects the lock to be held
+        """
+
+        name = disk_name(url)
+        if name not in self.disk_entries: return None
+
+        try:
+            with open(os.path.join(self.disk_dir, name)) as f:
+                data = json.load(f)
+
+        except (OSError, ValueError):
+            self.remove_disk(name)
+            return None
+
+        # a different url hashing to the same name
+        if data["url"] != url: return None
+
+        self.disk_entries.move_to_end(name)
+
+        entry = CacheEntry(data["headers"], data["body"])
+        entry.expires_at = data["expires_at"]
+
+        return entry
+
+
+    def write_disk(self, url, entry):
+        """
+        write an entry to the disk tier. expects the lock to be held
+        """
+
+        name = disk_name(url)
+        data = json.dumps({
+            "url": url,
+            "headers": entry.headers,
+            "body": entry.body,
+            "expires_at": entry.expires_at,
+        })
+
+        self.remove_disk(name)
+
+        if len(data) > self.disk_max_bytes: return
+
+        try:
+            with open(os.path.join(self.disk_dir, name), "w") as f:
+                f.write(data)
+
+        except OSError:
+            return
+
+        self.disk_entries[name] = len(data)
+        self.disk_size += len(data)
+
+        while self.disk_size > self.disk_max_bytes:
+            self.remove_disk(next(iter(self.disk_entries)))
+
+
+    def remove_disk(self, name):
+        """
+        delete an entry from the disk tier. expects the lock to be held
+        """
+
+        size = self.disk_entries.pop(name, None)
+        if size is None: return
+
+        self.disk_size -= size
+
+        try:
+            os.remove(os.path.join(self.disk_dir, name))
+
+        except OSError:
+            pass
+
+
+    def stats(self):
+        """
+        counters exported to the profiler
+        """
+
+        self.lock.acquire(blocking=True)
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "bytes": self.size,
+        }
+        self.lock.release()
+
+        return stats
+
+
+    def __repr__(self):
+        return f"HTTPCache(entries={len(self.entries)}, bytes={self.size}, \
+            hits={self.hits}, misses={self.misses})"
+
+
+def parse_cache_control(value):
+    """
+    parse Cache-Control header into a dict of directives
+    """
+
+    directives = {}
+
+    for directive in value.split(","):
+        directive = directive.strip().casefold()
+        if not directive: continue
+
+        if "=" in directive:
+            name, arg = directive.split("=", 1)
+            directives[name.strip()] = arg.strip().strip('"')
+
+        else:
+            directives[directive] = ""
+
+    return directives
+
+
+def is_cacheable(status, headers):
+    """
+    only successful responses which have a lifetime or can be
+    revalidated are stored, everything else always goes to the network
+    """
+
+    if status != "200": return False
+
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives: return False
+
+    if headers.get("vary", "").strip() == "*": return False
+
+    return "max-age" in directives or "etag" in headers or "last-modified" in headers
+
+
+def disk_name(url):
+    """
+    file name of a url in the disk tier
+    """
+
+    return hashlib.sha256(url.encode("utf8")).hexdigest()
@@ -9,13 +9,16 @@ INPUT_WIDTH_PX = 200
 
 
 class InputLayout:
-    def __init__(self, node, parent, previous) -> None:
+    def __init__(self, node, parent) -> None:
         self.node = node
         self.parent = parent
-        self.previous = previous
         self.children = []
         self.font = None
 
+        # cached paint commands, see paint_tree
+        self.display_list = None
+        node.layout_object = self
+
         # sizing, position
         self.width = 0
         self.height = 0
@@ -28,21 +31,13 @@ class InputLayout:
         determining how to add InputLayour object to the layout tree
         """
 
-        weight = self.node.style["font-weight"]
-        style = self.node.style["font-style"]
-        size = int(float(self.node.style["font-size"][:-2]) * .75)
-        self.font = get_font(size, weight, style)
+        computed = self.node.computed_style
+        self.font = get_font(computed.font_size, computed.font_weight, computed.font_style)
 
+        # x & y are decided by the line, like for words
         self.width = INPUT_WIDTH_PX
         self.height = linespace(self.font)
 
-        if self.previous:
-            space = self.previous.font.measureText(" ")
-            self.x = self.previous.x + space + self.previous.width
-
-        else:
-            self.x = self.parent.x
-
 
     def self_rect(self):
         return skia.Rect.MakeLTRB(self.x, self.y, 
@@ -66,11 +61,11 @@ class InputLayout:
 
         cmds = []
 
-        bg_color = self.node.style.get("background-color", "transparent")
+        computed = self.node.computed_style
 
-        if bg_color != "transparent":
-            radius = float(self.node.style.get("border-radius", "0px")[:-2])
-            cmds.append(DrawRRect(self.self_rect(), radius, bg_color))
+        if computed.background_color is not None:
+            cmds.append(DrawRRect(self.self_rect(), computed.border_radius, 
+                                  computed.background_color))
 
         if self.node.tag == "input":
             text = self.node.attributes.get("value", "")
@@ -83,7 +78,7 @@ class InputLayout:
                 print("Ignoring HTML contents inside button")
                 text = ""
 
-        color = self.node.style["color"]
+        color = computed.color
         cmds.append(DrawText(self.x, self.y, text, self.font, color))
 
         if self.node.is_focused:
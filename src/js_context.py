@@ -1,6 +1,6 @@
 import dukpy
 import traceback
-from css_parser import CSSParser
+from css_parser import CSSParser, parse_inline_style
 from helpers import tree_to_list
 from html_parser import HTMLParser
 import threading
@@ -162,13 +162,15 @@ class JSContext:
             elt = self.handle_to_node[handle]
 
             # add the text content as a child node
-            elt.children = new_nodes
+            elt.set_children(new_nodes)
+            self.tab.set_needs_layout(elt)
 
             for child in elt.children:
                 child.parent = elt
 
-            # re render, since we have modified the layout tree
-            self.tab.set_needs_render()
+                # re render, since we have modified the layout tree.
+                # only the new nodes need to be styled
+                self.tab.set_needs_style(child)
 
         except:
             traceback.print_exc()
@@ -261,4 +263,7 @@ class JSContext:
 
         elt = self.handle_to_node[handle]
         elt.attributes["style"] = s;
-        self.tab.set_needs_render()
+
+        # update parsed declarations directly so restyle can use them as is
+        elt.inline_style = parse_inline_style(s)
+        self.tab.set_needs_style(elt)
@@ -1,4 +1,21 @@
+from array import array
+
+import skia
+
+from helpers import font_metrics
+from text import Text
+from text_layout import TextLayout
+from draw import DrawTextBlob
+
+
 class LineLayout:
+    """
+    A line of inline content. Words are not layout objects of their own,
+    they are kept in parallel arrays and only turned into TextLayout
+    objects when needed, since text heavy pages have millions of them.
+    Inputs & buttons on the line are InputLayout children
+    """
+
     def __init__(self, node, parent, previous) -> None:
         self.node = node
         self.parent = parent
@@ -10,7 +27,59 @@ class LineLayout:
         self.height = 0
         self.width = 0
 
-    
+        # cached paint commands, see paint_tree
+        self.display_list = None
+
+        # distinct nodes on the line and the font of each one
+        self.nodes = []
+        self.fonts = []
+
+        # one entry per item on the line, words & inputs. words are
+        # a slice of the text of their node, inputs have no text
+        self.node_ids = array("I")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.xs = array("d")
+        self.widths = array("d")
+
+        # largest ascent of the fonts on the line, the baseline
+        # is kept relative to y so lines can be moved as a whole
+        self.max_ascent = 0
+
+
+    def add_word(self, node, font, start, end, width):
+        """
+        add the word node.text[start:end] at the end of the line
+        """
+
+        self.add_item(node, font, start, end, width)
+
+
+    def add_input(self, input):
+        """
+        add an input or button at the end of the line
+        """
+
+        self.children.append(input)
+        self.add_item(input.node, None, 0, 0, 0)
+
+
+    def add_item(self, node, font, start, end, width):
+        """
+        append an item to the arrays of the line
+        """
+
+        if not self.nodes or self.nodes[-1] is not node:
+            self.nodes.append(node)
+            self.fonts.append(font)
+
+        self.node_ids.append(len(self.nodes) - 1)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.xs.append(0)
+        self.widths.append(width)
+
+
     def layout(self):
         """
         laying out LineLayout objects in the layout tree
@@ -27,41 +96,143 @@ class LineLayout:
         else:
             self.y = self.parent.y
 
-        # run layout for TextLayout nodes under the LineLayout parent
-        for word in self.children:
-            word.layout()
-
-        # if no children do not compute font metrics, 
-        # since there will be no TextLayout child nodes
-        if not self.children:
+        # if no words or inputs do not compute font metrics
+        if not self.node_ids:
             self.height = 0
             return
 
+        # inputs decide on their own font & size
+        for input in self.children:
+            input.layout()
+
+        inputs = iter(self.children)
+        fonts = self.fonts
+
+        # each item starts a space after the end of the previous one
+        x = self.x
+
+        for i, node_id in enumerate(self.node_ids):
+            if isinstance(self.nodes[node_id], Text):
+                width = self.widths[i]
+                font = fonts[node_id]
+                self.xs[i] = x
+
+            else:
+                input = next(inputs)
+                input.x = x
+                width = input.width
+                font = fonts[node_id] = input.font
+
+            x = x + font_metrics(font).space_width + width
+
         # compute ascent, descent to layout words accurately
-        max_ascent = max([-word.font.getMetrics().fAscent for word in self.children])
-        baseline = self.y + 1.25 * max_ascent
+        metrics = [font_metrics(font) for font in fonts]
+
+        self.max_ascent = max([-m.ascent for m in metrics])
+        baseline = self.y + 1.25 * self.max_ascent
 
-        for word in self.children:
-            word.y = baseline + word.font.getMetrics().fAscent
+        for input in self.children:
+            input.y = baseline + font_metrics(input.font).ascent
 
-        max_descent = max([word.font.getMetrics().fDescent for word in self.children])
+        max_descent = max([m.descent for m in metrics])
+
+        self.height = 1.25 * (self.max_ascent + max_descent)
+
+
+    def words(self):
+        """
+        yields node, font, text, x, y, width for each word on the line
+        """
+
+        baseline = self.y + 1.25 * self.max_ascent
+
+        for i, node_id in enumerate(self.node_ids):
+            node = self.nodes[node_id]
+            if not isinstance(node, Text): continue
+
+            font = self.fonts[node_id]
+            word = node.text[self.starts[i]:self.ends[i]]
+            y = baseline + font_metrics(font).ascent
+
+            yield node, font, word, self.xs[i], y, self.widths[i]
+
+
+    def text_rect(self):
+        """
+        rect around the words of the line. word boxes are taller
+        than the line itself, see TextLayout
+        """
+
+        rect = skia.Rect.MakeEmpty()
+        baseline = self.y + 1.25 * self.max_ascent
+
+        for node, font in zip(self.nodes, self.fonts):
+            if not isinstance(node, Text): continue
+
+            metrics = font_metrics(font)
+            top = baseline + metrics.ascent
+            rect.join(skia.Rect.MakeLTRB(self.x, top, self.x + self.width, 
+                                         top + metrics.linespace + 20))
+
+        return rect
+
+
+    def text_layouts(self):
+        """
+        creates layout objects for the words on the line,
+        used for hit testing
+        """
+
+        return [TextLayout(node, word, self, x, y, width, font)
+                for node, font, word, x, y, width in self.words()]
 
-        self.height = 1.25 * (max_ascent + max_descent)
 
-    
     def paint(self):
+        """
+        creates a DrawTextBlob for each run of 
+        words with the same font & color on the line
+        """
+
+        cmds = []
+        run = []
+
+        for node, font, word, x, y, width in self.words():
+            color = node.computed_style.color
+
+            if run and (run[0][0] is not font or run[0][1] != color):
+                cmds.append(text_run(run))
+                run = []
+
+            run.append((font, color, word, x, y, width))
+
+        if run:
+            cmds.append(text_run(run))
+
+        return cmds
 
-        return []
-    
 
     def should_paint(self):
         return True
-    
+
 
     def paint_effects(self, cmds):
 
         return cmds
-    
+
 
     def __repr__(self) -> str:
         return f"LineLayout(x={self.x}, y={self.y}, width={self.width}, height={self.height})"
+
+
+def text_run(run):
+    """
+    paint command for words of the same font & color, words
+    of the same font on a line all have the same y
+    """
+
+    font, color, _, _, y, _ = run[0]
+    words = [word for _, _, word, _, _, _ in run]
+    xs = [x for _, _, _, x, _, _ in run]
+    widths = [width for _, _, _, _, _, width in run]
+
+    return DrawTextBlob(y, words, xs, widths, font, color)
@@ -0,0 +1,103 @@
+import re
+
+from html_parser import HTMLParser
+
+
+# text between a pair of tag delimiters, same as what the parser sees as a tag
+TAG = re.compile("<([^<>]*)>")
+
+# longest unfinished tag kept between chunks, anything
+# longer is most likely not a tag we care about
+MAX_PENDING = 4096
+
+
+class PreloadScanner:
+    """
+    Looks for scripts and stylesheets in the raw html while it is still
+    downloading and starts fetching them before the tree builder reaches them
+    """
+
+    def __init__(self, base_url, allowed_request, submit) -> None:
+        self.base_url = base_url
+        self.allowed_request = allowed_request
+
+        # function which starts a download & returns a future for it
+        self.submit = submit
+
+        # str(url) -> future of (headers, body)
+        self.requests = {}
+
+        # start of a tag which was cut off at the end of the last chunk
+        self.pending = ""
+
+        # reused to split tags into name and attributes like the parser does
+        self.tag_parser = HTMLParser()
+
+
+    def feed(self, chunk):
+        """
+        scan a chunk of html for subresources
+        """
+
+        text = self.pending + chunk
+        end = 0
+
+        for match in TAG.finditer(text):
+            self.scan_tag(match.group(1))
+            end = match.end()
+
+        # keep an unfinished tag around for the next chunk
+        start = text.rfind("<", end)
+        self.pending = text[start:] if start >= 0 else ""
+
+        if len(self.pending) > MAX_PENDING:
+            self.pending = ""
+
+
+    def scan_tag(self, tag_text):
+        """
+        start a download if a tag refers to a script or stylesheet
+        """
+
+        if not tag_text or tag_text.isspace(): return
+
+        tag, attributes = self.tag_parser.get_attributes(tag_text)
+
+        if tag == "script" and "src" in attributes:
+            link = attributes["src"]
+
+        elif tag == "link" and attributes.get("rel") == "stylesheet" \
+            and "href" in attributes:
+            link = attributes["href"]
+
+        else:
+            return
+
+        try:
+            url = self.base_url.resolve(link)
+
+        except Exception:
+            return
+
+        # scanning is speculative, so we never fetch anything the csp blocks
+        if not self.allowed_request(url): return
+
+        self.fetch(url)
+
+
+    def fetch(self, url):
+        """
+        returns the download for a url, starting it if
+        the scanner has not come across the url yet
+        """
+
+        key = str(url)
+
+        if key not in self.requests:
+            self.requests[key] = self.submit(url)
+
+        return self.requests[key]
+
+
+    def __repr__(self):
+        return f"PreloadScanner(requests={list(self.requests)})"
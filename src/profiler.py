@@ -1,3 +1,4 @@
+import json
 import time
 import threading
 
@@ -62,6 +63,25 @@ class MeasureTime:
         self.lock.release()
 
 
+    def counter(self, name, values):
+        """
+        to record values of counters, shown as a graph in the trace
+        """
+
+        ts = time.time() * 1_000_000
+
+        self.lock.acquire(blocking=True)
+
+        self.file.write(
+            ', { "ph": "C", "cat": "_",' +
+            '"name": "' + name + '",' +
+            '"ts": ' + str(ts) + ',' +
+            '"pid": 1, "args": ' + json.dumps(values) + '}')
+        self.file.flush()
+
+        self.lock.release()
+
+
     def finish(self):
         """
         to signal end of profiling
@@ -0,0 +1,57 @@
+# height of the horizontal bands items are bucketed into
+BAND_HEIGHT = 256
+
+
+class SpatialIndex:
+    """
+    Finds the items overlapping a rect without going through all of them.
+    Pages grow downwards, so items are bucketed into horizontal bands
+    and only their vertical extent is compared
+    """
+
+    def __init__(self, rects) -> None:
+        self.extents = []
+        self.bands = {}
+
+        for i, rect in enumerate(rects):
+            top, bottom = rect.top(), rect.bottom()
+            self.extents.append((top, bottom))
+
+            for band in bands_for(top, bottom):
+                self.bands.setdefault(band, []).append(i)
+
+
+    def query(self, rect):
+        """
+        indices of the items overlapping rect vertically, in the order 
+        they were given. edges count as overlapping, so lines with no
+        height are found too
+        """
+
+        top, bottom = rect.top(), rect.bottom()
+        found = set()
+
+        for band in bands_for(top, bottom):
+            for i in self.bands.get(band, ()):
+                (item_top, item_bottom) = self.extents[i]
+
+                if item_top <= bottom and item_bottom >= top:
+                    found.add(i)
+
+        return sorted(found)
+
+
+    def __len__(self):
+        return len(self.extents)
+
+
+    def __repr__(self):
+        return f"SpatialIndex(items={len(self.extents)}, bands={len(self.bands)})"
+
+
+def bands_for(top, bottom):
+    """
+    the bands a vertical extent falls into
+    """
+
+    return range(int(top // BAND_HEIGHT), int(bottom // BAND_HEIGHT) + 1)
@@ -0,0 +1,51 @@
+from css_parser import cascade_priority
+from descendent_selector import DescendantSelector
+
+
+class Stylesheet:
+    """
+    Rules compiled once into cascade order and bucketed by the tag of 
+    their rightmost selector. A stylesheet is never modified, adding 
+    rules builds a new one, so a single instance can be shared by tabs
+    """
+
+    def __init__(self, rules=()) -> None:
+        self.rules = tuple(rules)
+
+        index = {}
+        for rule in sorted(self.rules, key=cascade_priority):
+            selector, _ = rule
+            index.setdefault(rightmost_tag(selector), []).append(rule)
+
+        self.index = {tag: tuple(bucket) for tag, bucket in index.items()}
+
+
+    def extend(self, rules):
+        """
+        returns a new stylesheet with rules added after the existing ones
+        """
+
+        return Stylesheet(self.rules + tuple(rules))
+
+
+    def rules_for(self, tag):
+        """
+        returns rules which might match an element with the tag, in cascade order
+        """
+
+        return self.index.get(tag, ())
+
+
+    def __repr__(self):
+        return f"Stylesheet(rules={len(self.rules)}, tags={len(self.index)})"
+
+
+def rightmost_tag(selector):
+    """
+    returns the tag a node must have to match a selector
+    """
+
+    while isinstance(selector, DescendantSelector):
+        selector = selector.descendant
+
+    return selector.tag
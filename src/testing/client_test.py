@@ -0,0 +1,200 @@
+import http.server
+import os
+import sys
+import threading
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from client import URL, CONNECTION_POOL
+from connection_pool import MAX_CONNECTIONS_PER_HOST
+
+
+# more requests than the pool keeps sockets open to one host
+REQUESTS = 3 * MAX_CONNECTIONS_PER_HOST
+
+# a request which takes longer than this is stuck waiting for a socket
+TIMEOUT_SEC = 5
+
+BODY = b"x" * (256 * 1024)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """
+    keep-alive server answering every GET with the same uncacheable body
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """
+    the client drops sockets of unread bodies, which is expected here
+    """
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class ClosingHandler(Handler):
+    """
+    server which closes the socket after each response without telling
+    the client, like an idle keep-alive socket timing out on the server
+    """
+
+    def do_GET(self):
+        super().do_GET()
+        self.close_connection = True
+
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.do_GET()
+
+
+def serve(handler=Handler):
+    """
+    start the server on a free port, returns it with its url
+    """
+
+    server = Server(("localhost", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, URL(f"http://localhost:{server.server_port}/")
+
+
+def within_timeout(requests):
+    """
+    run requests in a thread and fail if they block on the pool
+    """
+
+    errors = []
+
+    def run():
+        try: requests()
+        except Exception as e: errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT_SEC)
+
+    assert not thread.is_alive(), "request blocked waiting for a pooled socket"
+    assert not errors, errors
+
+
+def open_count(url):
+    return CONNECTION_POOL.open_count.get((url.scheme, url.host, url.port), 0)
+
+
+def test_unread_bodies_free_their_connection():
+    server, url = serve()
+
+    def requests():
+        for _ in range(REQUESTS):
+            url.stream(None)
+
+    within_timeout(requests)
+    assert open_count(url) == 0
+
+    server.shutdown()
+
+
+def test_unread_bodies_kept_around_free_their_connection_when_closed():
+    server, url = serve()
+
+    def requests():
+        bodies = []
+
+        for _ in range(REQUESTS):
+            headers, body = url.stream(None)
+            body.close()
+            bodies.append(body)
+
+    within_timeout(requests)
+    assert open_count(url) == 0
+
+    server.shutdown()
+
+
+def test_partly_read_bodies_free_their_connection():
+    server, url = serve()
+
+    def requests():
+        for _ in range(REQUESTS):
+            headers, body = url.stream(None)
+
+            with body:
+                next(body)
+
+    within_timeout(requests)
+    assert open_count(url) == 0
+
+    server.shutdown()
+
+
+def test_read_bodies_keep_their_connection_alive():
+    server, url = serve()
+
+    def requests():
+        for _ in range(REQUESTS):
+            headers, body = url.request(None)
+            assert body == BODY.decode("utf8")
+
+    within_timeout(requests)
+    assert open_count(url) == 1
+
+    server.shutdown()
+    CONNECTION_POOL.close_all()
+
+
+def test_stale_sockets_are_retried_for_get():
+    server, url = serve(ClosingHandler)
+
+    def requests():
+        for _ in range(REQUESTS):
+            headers, body = url.request(None)
+            assert body == BODY.decode("utf8")
+
+    within_timeout(requests)
+    server.shutdown()
+    CONNECTION_POOL.close_all()
+
+
+def test_stale_sockets_are_not_retried_for_post():
+    server, url = serve(ClosingHandler)
+
+    def requests():
+        url.request(None)
+
+        try:
+            url.request(None, "name=value")
+
+        except ConnectionError:
+            return
+
+        raise AssertionError("POST was sent again on a fresh connection")
+
+    within_timeout(requests)
+    assert open_count(url) == 0
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,102 @@
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import html_parser
+from element import BLOCK_ELEMENTS
+from helpers import tree_to_list
+
+
+# number of paragraphs, each one adds two elements and three text nodes
+PARAGRAPHS = 20_000
+
+
+class DictElement:
+    """
+    node layout before __slots__, kept for comparison
+    """
+
+    def __init__(self, tag, attributes, parent):
+        self.tag = tag
+        self.children = []
+        self.parent = parent
+        self.attributes = attributes
+        self.style = {}
+        self.is_focused = False
+        self.animations = {}
+        self.has_block_child = False
+
+
+    def append_child(self, child):
+        """
+        add a child at the end of the children, as Element does
+        """
+
+        self.children.append(child)
+
+        if isinstance(child, DictElement) and child.tag in BLOCK_ELEMENTS:
+            self.has_block_child = True
+
+
+class DictText:
+    """
+    node layout before __slots__, kept for comparison
+    """
+
+    def __init__(self, text, parent):
+        self.text = text
+        self.children = []
+        self.parent = parent
+        self.style = {}
+        self.is_focused = False
+        self.animations = {}
+
+
+def document():
+    """
+    document with roughly 100k nodes
+    """
+
+    para = "<p class=text>some text <b>bold</b> more</p>"
+    return "<html><body>" + para * PARAGRAPHS + "</body></html>"
+
+
+def measure(body):
+    """
+    parse body and return the number of nodes and bytes allocated for them
+    """
+
+    gc.collect()
+    tracemalloc.start()
+
+    tree = html_parser.HTMLParser(body).parse()
+    size, _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    nodes = len(tree_to_list(tree, []))
+    return nodes, size
+
+
+def benchmark():
+    body = document()
+
+    element, text = html_parser.Element, html_parser.Text
+
+    html_parser.Element, html_parser.Text = DictElement, DictText
+    nodes, before = measure(body)
+
+    html_parser.Element, html_parser.Text = element, text
+    _, after = measure(body)
+
+    print(f"nodes: {nodes}")
+    print(f"before: {before / nodes:7.1f} bytes/node  {before / 1_000_000:6.1f} MB")
+    print(f"after:  {after / nodes:7.1f} bytes/node  {after / 1_000_000:6.1f} MB")
+    print(f"saved:  {100 * (1 - after / before):.0f}%")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,97 @@
+import os
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from block_layout import BlockLayout
+from css_parser import CSSParser, style
+from document_layout import DocumentLayout
+from element import Element, BLOCK_ELEMENTS
+from helpers import mark_needs_layout, tree_to_list
+from html_parser import HTMLParser
+from stylesheet import Stylesheet
+from text import Text
+from timing import gc_paused, timed
+
+
+# number of sibling paragraphs in the generated documents
+WIDTHS = [1_000, 5_000, 20_000]
+
+# number of relayouts timed per document
+RELAYOUTS = 20
+
+
+def scanning_layout_mode(self):
+    """
+    layout_mode before the has_block_child flag, kept for comparison
+    """
+
+    if isinstance(self.node, Text):
+        return "inline"
+
+    elif any([isinstance(child, Element) and \
+              child.tag in BLOCK_ELEMENTS for child in self.node.children]):
+        return "block"
+
+    elif self.node.children or self.node.tag == "input":
+        return "inline"
+
+    else:
+        return "block"
+
+
+def flat_document(width):
+    """
+    document with many paragraphs directly inside the body
+    """
+
+    para = "<p>Lorem ipsum <b>dolor</b> sit amet</p>"
+    return "<html><body>" + para * width + "</body></html>"
+
+
+def time_layout(nodes):
+    """
+    time a full layout and the average relayout after one text node changed
+    """
+
+    text = [node for node in tree_to_list(nodes, []) if isinstance(node, Text)][-1]
+    document = DocumentLayout(nodes)
+
+    def relayout():
+        mark_needs_layout(text)
+        document.layout()
+
+    with gc_paused():
+        full = timed(document.layout)
+        relayout_time = timed(relayout, RELAYOUTS)
+
+    return full, relayout_time
+
+
+def benchmark():
+    with open(os.path.join(SRC_DIR, "browser.css")) as f:
+        stylesheet = Stylesheet(CSSParser(f.read()).parse())
+
+    layout_mode = BlockLayout.layout_mode
+
+    for width in WIDTHS:
+        nodes = HTMLParser(flat_document(width)).parse()
+        style(nodes, stylesheet, None)
+
+        # measure all words once, so both runs find them cached
+        DocumentLayout(nodes).layout()
+
+        BlockLayout.layout_mode = scanning_layout_mode
+        full_before, relayout_before = time_layout(nodes)
+
+        BlockLayout.layout_mode = layout_mode
+        full_after, relayout_after = time_layout(nodes)
+
+        print(f"{width} paragraphs")
+        print(f"  full layout  before: {full_before * 1000:8.2f} ms  after: {full_after * 1000:8.2f} ms")
+        print(f"  relayout     before: {relayout_before * 1000:8.2f} ms  after: {relayout_after * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
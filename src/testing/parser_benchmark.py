@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from html_parser import HTMLParser
+from timing import gc_paused, timed
+
+
+# sizes of the generated documents in bytes
+SIZES = [1_250_000, 2_500_000, 5_000_000, 10_000_000]
+
+# number of nested <div> elements in the deep documents
+DEPTH = 500
+
+
+def flat_document(size):
+    """
+    document with many sibling paragraphs
+    """
+
+    para = "<p class=text>Lorem ipsum <b>dolor</b> sit amet, <i>consectetur</i> adipiscing elit.</p>\n"
+    return "<!doctype html><html><head><title>flat</title></head><body>" + \
+        para * (size // len(para)) + "</body></html>"
+
+
+def deep_document(size):
+    """
+    document with text inside deeply nested elements
+    """
+
+    para = "<span>word word word</span> text\n"
+    block = "<div>" * DEPTH + para * 100 + "</div>" * DEPTH
+
+    return "<!doctype html><html><body>" + block * (size // len(block)) + "</body></html>"
+
+
+def benchmark(name, make_document):
+    """
+    time parsing of generated documents of increasing size
+    """
+
+    print(name)
+    previous = None
+
+    for size in SIZES:
+        body = make_document(size)
+
+        with gc_paused():
+            elapsed = timed(lambda: HTMLParser(body).parse())
+
+        per_mb = elapsed / (len(body) / 1_000_000)
+        growth = f"x{elapsed / previous:.2f}" if previous else ""
+        print(f"  {len(body) / 1_000_000:6.2f} MB  {elapsed:7.3f} s  {per_mb:6.3f} s/MB  {growth}")
+        previous = elapsed
+
+
+if __name__ == "__main__":
+
+    # doubling the size should roughly double the time
+    benchmark("flat", flat_document)
+    benchmark(f"deep (depth {DEPTH})", deep_document)
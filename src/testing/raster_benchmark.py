@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+import skia
+
+from compositing import TILE_CACHE, CompositedLayer, DrawCompositedLayer
+from css_parser import CSSParser, style
+from document_layout import DocumentLayout
+from helpers import paint_tree, add_parent_pointers, mark_needs_layout, tree_to_list
+from html_parser import HTMLParser
+from stylesheet import Stylesheet
+from text import Text
+
+
+# number of lines in the generated documents
+LINES = [100, 50_000]
+
+# size of the window below the browser chrome
+WIDTH, HEIGHT = 800, 500
+
+# scroll steps timed per document, the same as the browser scrolls
+# by. the short document is only this long, so both scroll as far
+STEPS = 30
+SCROLL_STEP = 50
+
+
+def lines_document(lines):
+    """
+    document with one short paragraph per line
+    """
+
+    return "".join(f"<p>line {i} of the document</p>" for i in range(lines))
+
+
+def composite(document):
+    """
+    put the display list into one layer, as the browser does
+    for pages without visual effects
+    """
+
+    display_list = []
+    paint_tree(document, display_list)
+    add_parent_pointers(display_list)
+
+    layer = CompositedLayer(None, display_list[0])
+    for cmd in display_list[1:]:
+        layer.add(cmd)
+
+    return layer
+
+
+def time_scrolling(layer):
+    """
+    average time to raster & draw one scroll step
+    """
+
+    surface = skia.Surface(WIDTH, HEIGHT)
+    canvas = surface.getCanvas()
+    draw = DrawCompositedLayer(layer)
+
+    max_scroll = max(0, layer.composited_bounds().bottom() - HEIGHT)
+    scroll = 0
+
+    # the first raster builds the index of the layer,
+    # that happens once per page load and not per scroll
+    layer.raster(skia.Rect.MakeXYWH(0, scroll, WIDTH, HEIGHT))
+
+    start = time.perf_counter()
+
+    for _ in range(STEPS):
+        scroll = min(scroll + SCROLL_STEP, max_scroll)
+        viewport = skia.Rect.MakeXYWH(0, scroll, WIDTH, HEIGHT)
+
+        layer.raster(viewport)
+
+        canvas.clear(skia.ColorWHITE)
+        canvas.save()
+        canvas.translate(0, -scroll)
+        draw.execute(canvas)
+        canvas.restore()
+
+    surface.flushAndSubmit()
+
+    return (time.perf_counter() - start) / STEPS
+
+
+def time_change(document, layer, adopt):
+    """
+    time to raster the viewport again after a line in it changed,
+    with or without taking over the tiles of the old layer
+    """
+
+    text = [node for node in tree_to_list(document.node, [])
+            if isinstance(node, Text)][10]
+
+    text.text = text.text.upper()
+    mark_needs_layout(text)
+    document.layout()
+
+    new_layer = composite(document)
+
+    if adopt:
+        new_layer.adopt_tiles(layer)
+
+    else:
+        layer.release()
+
+    viewport = skia.Rect.MakeXYWH(0, 0, WIDTH, HEIGHT)
+    rasters = TILE_CACHE.rasters
+
+    start = time.perf_counter()
+    new_layer.raster(viewport)
+    elapsed = time.perf_counter() - start
+
+    return new_layer, elapsed, TILE_CACHE.rasters - rasters
+
+
+def benchmark():
+    with open(os.path.join(SRC_DIR, "browser.css")) as f:
+        stylesheet = Stylesheet(CSSParser(f.read()).parse())
+
+    for lines in LINES:
+        nodes = HTMLParser(lines_document(lines)).parse()
+        style(nodes, stylesheet, None)
+
+        document = DocumentLayout(nodes)
+        document.layout()
+
+        layer = composite(document)
+
+        per_step = time_scrolling(layer)
+        height = layer.composited_bounds().height()
+
+        print(f"{lines} lines, {height / 1000:.0f}k px tall")
+        print(f"  scroll step: {per_step * 1000:8.3f} ms")
+
+        # scroll back up, so the changed line is in the viewport
+        layer.raster(skia.Rect.MakeXYWH(0, 0, WIDTH, HEIGHT))
+
+        for adopt in [False, True]:
+            layer, elapsed, tiles = time_change(document, layer, adopt)
+            name = "kept tiles" if adopt else "all tiles"
+            print(f"  line changed, {name}: {elapsed * 1000:8.3f} ms  {tiles} tiles rastered")
+
+        layer.release()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,67 @@
+import gc
+import os
+import sys
+import tracemalloc
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from css_parser import CSSParser, style
+from document_layout import DocumentLayout
+from helpers import paint_tree
+from html_parser import HTMLParser
+from stylesheet import Stylesheet
+from timing import gc_paused, timed
+
+
+# size of the generated page in bytes
+SIZE = 1_000_000
+
+
+def plain_text(size):
+    """
+    page which is nothing but text, like a log or a book
+    """
+
+    line = "the quick brown fox jumps over the lazy dog and keeps running\n"
+    return line * (size // len(line))
+
+
+def benchmark():
+    with open(os.path.join(SRC_DIR, "browser.css")) as f:
+        stylesheet = Stylesheet(CSSParser(f.read()).parse())
+
+    nodes = HTMLParser(plain_text(SIZE)).parse()
+    style(nodes, stylesheet, None)
+
+    # measure all words once, so the timings do not include skia measuring
+    DocumentLayout(nodes).layout()
+
+    document = DocumentLayout(nodes)
+
+    with gc_paused():
+        layout_time = timed(document.layout)
+        paint_time = timed(lambda: paint_tree(document, []))
+
+    # tracing allocations slows everything down, so memory 
+    # is measured separately from the timings
+    del document
+    gc.collect()
+    tracemalloc.start()
+
+    document = DocumentLayout(nodes)
+    document.layout()
+    layout_size, _ = tracemalloc.get_traced_memory()
+
+    paint_tree(document, [])
+    total_size, _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    print(f"page:          {SIZE / 1_000_000:.1f} MB of text")
+    print(f"layout:        {layout_time * 1000:8.1f} ms  {layout_size / 1_000_000:6.1f} MB")
+    print(f"paint:         {paint_time * 1000:8.1f} ms  {(total_size - layout_size) / 1_000_000:6.1f} MB")
+
+
+if __name__ == "__main__":
+    benchmark()
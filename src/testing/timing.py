@@ -0,0 +1,33 @@
+import gc
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def gc_paused():
+    """
+    garbage collector passes grow with the number of live objects,
+    benchmarks building large trees keep them out of their timings
+    """
+
+    gc.collect()
+    gc.disable()
+
+    try:
+        yield
+
+    finally:
+        gc.enable()
+
+
+def timed(run, repeat=1):
+    """
+    average time of a call to run in seconds
+    """
+
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        run()
+
+    return (time.perf_counter() - start) / repeat
@@ -1,11 +1,32 @@
+from element import EMPTY_CHILDREN, EMPTY_STYLE, EMPTY_ANIMATIONS
+
+
 class Text:
+    __slots__ = (
+        "text", "children", "parent", "style", "computed_style", 
+        "animations", "blend_op", "needs_style", "needs_layout",
+        "layout_object",
+    )
+
+    # text nodes can never be focused and never have children
+    is_focused = False
+    children_need_style = False
+    children_need_layout = False
+
     def __init__(self, text, parent):
         self.text = text
-        self.children = []
+        self.children = EMPTY_CHILDREN
         self.parent = parent
-        self.style = {}
-        self.is_focused = False
-        self.animations = {}
+        self.style = EMPTY_STYLE
+        self.computed_style = None
+        self.animations = EMPTY_ANIMATIONS
+
+        # dirty bits for style & layout, new nodes need both
+        self.needs_style = True
+        self.needs_layout = True
+
+        # layout object painting the text, None when it is part of a line
+        self.layout_object = None
 
 
     def __repr__(self):
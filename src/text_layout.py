@@ -1,41 +1,24 @@
-from helpers import get_font, linespace
+from helpers import linespace
 from draw import DrawText
 from typing import List
 
 
 class TextLayout:
-    def __init__(self, node, word, parent, previous) -> None:
+    """
+    Layout object for a single word. Lines keep their words in arrays,
+    these are only created from them when a word is needed on its own
+    """
+
+    def __init__(self, node, word, parent, x, y, width, font) -> None:
         self.node = node
         self.word = word
         self.parent = parent
-        self.previous = previous
         self.children = []
+        self.font = font
 
-        self.x = 0
-        self.y = 0
-        self.height = 0
-        self.width = 0
-
-    
-    def layout(self):
-        """
-        compute where text must be placed before adding to layout tree
-        """
-
-        weight = self.node.style["font-weight"]
-        style = self.node.style["font-style"]
-        size = int(float(self.node.style["font-size"][:-2]) * 0.75)
-        self.font = get_font(size, weight, style)
-
-        self.width = self.font.measureText(self.word)
-
-        if self.previous:
-            space = self.previous.font.measureText(" ")
-            self.x = self.previous.x + space + self.previous.width
-
-        else:
-            self.x = self.parent.x
-
+        self.x = x
+        self.y = y
+        self.width = width
         self.height = linespace(self.font) + 20
 
     
@@ -45,8 +28,8 @@ class TextLayout:
         """
 
         cmds = []
-        color = self.node.style["color"]
-        cmds.append(DrawText(self.x, self.y, self.word, self.font, color))
+        color = self.node.computed_style.color
+        cmds.append(DrawText(self.x, self.y, self.word, self.font, color, self.width))
 
         return cmds
 
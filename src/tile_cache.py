@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+
+class TileCache:
+    """
+    Keeps the rastered tiles of all composited layers within a byte budget.
+    Tiles are evicted least recently used first, a layer rasters
+    them again when they come near the viewport
+    """
+
+    def __init__(self, max_bytes) -> None:
+        self.max_bytes = max_bytes
+
+        # (id of the tiles of a layer, tile position) -> (tiles of the layer,
+        # bytes), ordered from least to most recently used. tiles of a layer
+        # are a dict from tile position to surface
+        self.entries = OrderedDict()
+        self.size = 0
+
+        self.rasters = 0
+        self.evictions = 0
+
+
+    def add(self, tiles, position, surface):
+        """
+        store a newly rastered tile of a layer
+        """
+
+        size = surface.width() * surface.height() * 4
+
+        tiles[position] = surface
+        self.entries[(id(tiles), position)] = (tiles, size)
+        self.size += size
+        self.rasters += 1
+
+        self.evict()
+
+
+    def use(self, tiles, position):
+        """
+        mark a tile as used, so it is evicted last
+        """
+
+        self.entries.move_to_end((id(tiles), position))
+
+
+    def remove(self, tiles, position):
+        """
+        drop a tile whose contents changed
+        """
+
+        if position not in tiles: return
+
+        del tiles[position]
+        _, size = self.entries.pop((id(tiles), position))
+        self.size -= size
+
+
+    def remove_all(self, tiles):
+        """
+        drop all tiles of a layer which is not used anymore
+        """
+
+        for position in list(tiles):
+            self.remove(tiles, position)
+
+
+    def evict(self):
+        """
+        evict least recently used tiles until within budget
+        """
+
+        while self.size > self.max_bytes and self.entries:
+            (_, position), (tiles, size) = self.entries.popitem(last=False)
+
+            del tiles[position]
+            self.size -= size
+            self.evictions += 1
+
+
+    def stats(self):
+        """
+        counters exported to the profiler
+        """
+
+        return {
+            "tiles": len(self.entries),
+            "bytes": self.size,
+            "rasters": self.rasters,
+            "evictions": self.evictions,
+        }
+
+
+    def __repr__(self):
+        return f"TileCache(tiles={len(self.entries)}, bytes={self.size}, \
+            rasters={self.rasters}, evictions={self.evictions})"